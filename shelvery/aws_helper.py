@@ -1,12 +1,27 @@
 import json
+import threading
 import boto3
 from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from shelvery.runtime_config import RuntimeConfig
 from shelvery import S3_DATA_PREFIX
 
 class AwsHelper:
 
+    # assumed role credentials are renewed this long before they expire
+    CREDENTIALS_RENEW_BEFORE = timedelta(minutes=5)
+
+    # clients, assumed role credentials and account id are shared by all engines within process.
+    # boto3 clients are thread safe, though creating them from default session is not
+    _clients = {}
+    _credentials = {}
+    _account_id = None
+    _region = None
+    _lock = threading.RLock()
+    # roles of different accounts are assumed in parallel, each role only once at a time
+    _credentials_locks = {}
 
     @staticmethod
     def get_shelvery_bucket_policy(owner_id, share_account_ids, bucket_name):
@@ -46,13 +61,53 @@ class AwsHelper:
                 })
         return json.dumps({'Version': '2012-10-17', 'Id': 'shelvery-generated', 'Statement': policy_stmt})
 
+    @staticmethod
+    def rds_tags_by_arn(rds_client, arns, cache=None, max_workers=10):
+        """
+        Collects tags for given RDS resources, concurrently calling list_tags_for_resource
+        for each arn not already present in cache
+        :param rds_client: boto3 rds client
+        :param arns: RDS resource ARNs to collect tags for
+        :param cache: optional dictionary arn -> tags dictionary, populated with collected tags
+        :param max_workers: maximum number of concurrent list_tags_for_resource calls
+        :return: dictionary arn -> tags dictionary
+        """
+        if cache is None:
+            cache = {}
+        missing = [arn for arn in set(arns) if arn not in cache]
+
+        def load_tags(arn):
+            tags = rds_client.list_tags_for_resource(ResourceName=arn)['TagList']
+            return arn, dict(map(lambda t: (t['Key'], t['Value']), tags))
+
+        if len(missing) > 0:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                for arn, d_tags in executor.map(load_tags, missing):
+                    cache[arn] = d_tags
+
+        return dict((arn, cache[arn]) for arn in arns)
+
+    @staticmethod
+    def rds_boto3_tags(tags):
+        """
+        Converts tags dictionary to boto3 format accepted by RDS, which does
+        not allow commas in tag values
+        """
+        return list(map(lambda k: {'Key': k, 'Value': tags[k].replace(',', ' ')}, tags))
+
     @staticmethod
     def local_account_id():
-        return AwsHelper.boto3_client('sts').get_caller_identity()['Account']
+        # identity of process credentials does not change, so it is looked up once
+        if AwsHelper._account_id is None:
+            AwsHelper._account_id = AwsHelper.boto3_client('sts').get_caller_identity()['Account']
+        return AwsHelper._account_id
 
     @staticmethod
     def local_region():
-        return boto3.session.Session().region_name
+        # region of process does not change either, and session is costly to create on each lookup
+        if AwsHelper._region is None:
+            AwsHelper._region = boto3.session.Session().region_name
+        return AwsHelper._region
 
     @staticmethod
     def boto3_retry_config():
@@ -60,7 +115,21 @@ class AwsHelper:
 
     @staticmethod
     def boto3_sts(arn,external_id):
-        sts_client = boto3.client('sts',config=Config(retries={'max_attempts':AwsHelper.boto3_retry_config()}))
+        """Credentials of assumed role, cached until shortly before they expire"""
+        key = (arn, external_id)
+        with AwsHelper._lock:
+            credentials_lock = AwsHelper._credentials_locks.setdefault(key, threading.Lock())
+        with credentials_lock:
+            credentials = AwsHelper._credentials.get(key)
+            if credentials is None or \
+                    credentials['Expiration'] - datetime.now(timezone.utc) < AwsHelper.CREDENTIALS_RENEW_BEFORE:
+                credentials = AwsHelper.assume_role(arn, external_id)
+                AwsHelper._credentials[key] = credentials
+        return credentials
+
+    @staticmethod
+    def assume_role(arn, external_id):
+        sts_client = AwsHelper.boto3_client('sts')
         if external_id is not None:
             assumedRoleObject = sts_client.assume_role(
                 RoleArn=arn,
@@ -77,11 +146,24 @@ class AwsHelper:
 
     @staticmethod
     def boto3_client(service_name, region_name = None, arn = None, external_id = None):
+        """Client from pool shared within process, created on first use for each service, region and role"""
         if region_name is None:
             region_name = AwsHelper.local_region()
 
-        if arn is not None:
-            credentials = AwsHelper.boto3_sts(arn,external_id)
+        key = (service_name, region_name, arn, external_id)
+        # role is assumed before taking pool lock, as renewing credentials takes pool lock for sts client.
+        # credentials are looked up once, so client is stored under key id of credentials it was created with
+        credentials = AwsHelper.boto3_sts(arn, external_id) if arn is not None else None
+        access_key_id = credentials['AccessKeyId'] if credentials is not None else None
+        with AwsHelper._lock:
+            # clients of assumed roles are recreated once role credentials are renewed
+            if key not in AwsHelper._clients or AwsHelper._clients[key][0] != access_key_id:
+                AwsHelper._clients[key] = (access_key_id, AwsHelper.create_boto3_client(service_name, region_name, credentials))
+            return AwsHelper._clients[key][1]
+
+    @staticmethod
+    def create_boto3_client(service_name, region_name, credentials = None):
+        if credentials is not None:
             client = boto3.client(service_name,
                             aws_access_key_id=credentials['AccessKeyId'],
                             aws_secret_access_key=credentials['SecretAccessKey'],
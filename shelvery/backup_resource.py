@@ -1,7 +1,8 @@
 import hashlib
 import re
-import copy
 from datetime import datetime
+from functools import lru_cache
+from sys import intern
 from typing import Dict
 
 from dateutil.relativedelta import relativedelta
@@ -12,10 +13,27 @@ from shelvery.entity_resource import EntityResource
 from shelvery.runtime_config import RuntimeConfig
 import boto3
 
+# tag values up to this length (dates, regions, account ids, retention types) repeat
+# across backups, and are interned so that backups share single copy of each
+INTERN_VALUE_MAX_LENGTH = 16
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value: str, timestamp_format: str) -> datetime:
+    # backups created within same run share creation date, and datetime objects are immutable
+    return datetime.strptime(value, timestamp_format)
+
+
 class BackupResource:
     """Model representing single backup"""
 
+    __slots__ = (
+        'name', 'tags', 'date_created', 'account_id', 'retention_type', 'entity_id', 'entity_resource',
+        '__region', 'backup_id', 'expire_date', 'date_deleted', 'resource_properties', '_persisted_tags'
+    )
+
     BACKUP_MARKER_TAG = 'backup'
+    EXPIRE_AT_TAG = 'expire_at'
     TIMESTAMP_FORMAT = '%Y-%m-%d-%H%M'
     TIMESTAMP_FORMAT_LEGACY = '%Y%m%d-%H%M'
 
@@ -24,15 +42,21 @@ class BackupResource:
     RETENTION_MONTHLY = 'monthly'
     RETENTION_YEARLY = 'yearly'
 
-    def __init__(self, tag_prefix, entity_resource: EntityResource, construct=False, copy_resource_tags=True, exluded_resource_tag_keys=[], resource_properties={}):
-        """Construct new backup resource out of entity resource (e.g. ebs volume)."""
+    def __init__(self, tag_prefix, entity_resource: EntityResource, construct=False, copy_resource_tags=True, exluded_resource_tag_keys=[], resource_properties={}, account_id=None):
+        """
+        Construct new backup resource out of entity resource (e.g. ebs volume), in given account,
+        defaulting to account of current session
+        """
+        for slot in self.__slots__:
+            setattr(self, self._slot_attribute(slot), None)
+
         # if object manually created
         if construct:
             return
 
         # current date
         self.date_created = datetime.utcnow()
-        self.account_id = AwsHelper.local_account_id()
+        self.account_id = account_id if account_id is not None else AwsHelper.local_account_id()
 
         # determine retention period
         if self.date_created.day == 1:
@@ -88,13 +112,47 @@ class BackupResource:
         self.date_deleted = None
         self.resource_properties = resource_properties
 
-    def cross_account_copy(self, new_backup_id):
-        backup = copy.deepcopy(self)
+    @classmethod
+    def _slot_attribute(cls, slot):
+        # private slots are name mangled, same as attributes of earlier versions stored in s3
+        return f"_{cls.__name__}{slot}" if slot.startswith('__') else slot
+
+    def __getstate__(self):
+        # state keeps format of earlier versions, so backup metadata stored in s3 is readable by them.
+        # persisted tags are runtime state, not part of backup metadata
+        state = {}
+        for slot in self.__slots__:
+            if slot != '_persisted_tags':
+                attribute = self._slot_attribute(slot)
+                state[attribute] = getattr(self, attribute)
+        return state
+
+    def __setstate__(self, state):
+        for slot in self.__slots__:
+            setattr(self, self._slot_attribute(slot), None)
+        attributes = set(self._slot_attribute(slot) for slot in self.__slots__)
+        for key, value in state.items():
+            if key in attributes:
+                setattr(self, key, value)
+
+    def shallow_copy(self):
+        """Copy of backup that can be modified independently, sharing everything but tags"""
+        backup = BackupResource(None, None, True)
+        for slot in self.__slots__:
+            attribute = self._slot_attribute(slot)
+            setattr(backup, attribute, getattr(self, attribute))
+        backup.tags = self.tags.copy()
+        return backup
+
+    def cross_account_copy(self, new_backup_id, region=None, account_id=None):
+        # entity and resource properties are not modified, and are shared with original
+        backup = self.shallow_copy()
+        backup._persisted_tags = None
 
         # backup name and retention type are copied
         backup.backup_id = new_backup_id
-        backup.region = AwsHelper.local_region()
-        backup.account_id = AwsHelper.local_account_id()
+        backup.region = region if region is not None else AwsHelper.local_region()
+        backup.account_id = account_id if account_id is not None else AwsHelper.local_account_id()
 
         tag_prefix = self.tags['shelvery:tag_name']
         backup.tags[f"{tag_prefix}:region"] = backup.region
@@ -106,6 +164,8 @@ class BackupResource:
         backup.tags[f"{tag_prefix}:cross_account_copy"] = 'true'
         backup.tags[f"{tag_prefix}:dr_regions"] = ''
         backup.tags[f"{tag_prefix}:dr_copies"] = ''
+        # retention of copy is determined by destination account
+        backup.tags.pop(f"{tag_prefix}:{self.EXPIRE_AT_TAG}", None)
         return backup
 
 
@@ -113,16 +173,18 @@ class BackupResource:
     def construct(cls,
                   tag_prefix: str,
                   backup_id: str,
-                  tags: Dict):
+                  tags: Dict,
+                  account_id: str = None):
         """
-        Construct BackupResource object from object id and aws tags stored by shelvery
+        Construct BackupResource object from object id and aws tags stored by shelvery. Account
+        is read from tags, falling back to given account, or account of current session
         """
 
         obj = BackupResource(None, None, True)
-        obj.entity_resource = None
-        obj.entity_id = None
         obj.backup_id = backup_id
-        obj.tags = tags
+        obj.tags = cls.intern_tags(tags)
+        obj.mark_tags_persisted()
+        tags = obj.tags
 
         # read properties from tags
         obj.retention_type = tags[f"{tag_prefix}:retention_type"]
@@ -132,48 +194,81 @@ class BackupResource:
             obj.entity_id = tags[f"{tag_prefix}:entity_id"]
 
         try:
-            obj.date_created = datetime.strptime(tags[f"{tag_prefix}:date_created"], cls.TIMESTAMP_FORMAT)
+            obj.date_created = parse_timestamp(tags[f"{tag_prefix}:date_created"], cls.TIMESTAMP_FORMAT)
         except Exception as e:
             if 'does not match format' in str(e):
                 str_date = tags[f"{tag_prefix}:date_created"]
                 print(f"Failed to read {str_date} as date, trying legacy format {cls.TIMESTAMP_FORMAT_LEGACY}")
-                obj.date_created = datetime.strptime(tags[f"{tag_prefix}:date_created"], cls.TIMESTAMP_FORMAT_LEGACY)
+                obj.date_created = parse_timestamp(tags[f"{tag_prefix}:date_created"], cls.TIMESTAMP_FORMAT_LEGACY)
 
 
         obj.region = tags[f"{tag_prefix}:region"]
         if f"{tag_prefix}:src_account" in tags:
             obj.account_id = tags[f"{tag_prefix}:src_account"]
+        elif account_id is not None:
+            obj.account_id = account_id
         else:
             obj.account_id = AwsHelper.local_account_id()
 
         return obj
 
+    @staticmethod
+    def intern_tags(tags: Dict) -> Dict:
+        """Copy of tags with keys and short values interned, as they repeat across backups"""
+        return dict(
+            (intern(k), intern(v) if len(v) <= INTERN_VALUE_MAX_LENGTH else v)
+            for k, v in tags.items()
+        )
+
     def entity_resource_tags(self):
         return self.entity_resource.tags if self.entity_resource is not None else {}
 
+    @classmethod
+    def retention_period(cls, retention_type: str, resource_tags: Dict, engine, custom_retention_types=None):
+        """Period backup of given retention type is kept for, or None if it is kept forever"""
+        if retention_type == cls.RETENTION_DAILY:
+            return timedelta(days=RuntimeConfig.get_keep_daily(resource_tags, engine))
+        elif retention_type == cls.RETENTION_WEEKLY:
+            return relativedelta(weeks=RuntimeConfig.get_keep_weekly(resource_tags, engine))
+        elif retention_type == cls.RETENTION_MONTHLY:
+            return relativedelta(months=RuntimeConfig.get_keep_monthly(resource_tags, engine))
+        elif retention_type == cls.RETENTION_YEARLY:
+            return relativedelta(years=RuntimeConfig.get_keep_yearly(resource_tags, engine))
+        elif custom_retention_types is not None and retention_type in custom_retention_types:
+            return timedelta(seconds=custom_retention_types[retention_type])
+        return None
+
     def calculate_expire_date(self, engine, custom_retention_types=None):
         """Determine expire date, based on 'retention_type' tag"""
-        if self.retention_type == BackupResource.RETENTION_DAILY:
-            expire_date = self.date_created + timedelta(
-                days=RuntimeConfig.get_keep_daily(self.entity_resource_tags(), engine))
-        elif self.retention_type == BackupResource.RETENTION_WEEKLY:
-            expire_date = self.date_created + relativedelta(
-                weeks=RuntimeConfig.get_keep_weekly(self.entity_resource_tags(), engine))
-        elif self.retention_type == BackupResource.RETENTION_MONTHLY:
-            expire_date = self.date_created + relativedelta(
-                months=RuntimeConfig.get_keep_monthly(self.entity_resource_tags(), engine))
-        elif self.retention_type == BackupResource.RETENTION_YEARLY:
-            expire_date = self.date_created + relativedelta(
-                years=RuntimeConfig.get_keep_yearly(self.entity_resource_tags(), engine))
-        elif self.retention_type in custom_retention_types:
-            expire_date =  self.date_created + timedelta(
-                seconds=custom_retention_types[self.retention_type])
+        period = self.retention_period(self.retention_type, self.entity_resource_tags(), engine, custom_retention_types)
+        if period is not None:
+            expire_date = self.date_created + period
         else:
             # in case there is no retention tag on backup, we want it kept forever
             expire_date = datetime.utcnow() + relativedelta(years=10)
 
         self.expire_date = expire_date
 
+    def stamp_expire_date(self, engine, custom_retention_types=None):
+        """
+        Store expire date in sortable tag, so cleanup may read it instead of
+        resolving retention again. Backups kept forever are not stamped
+        """
+        period = self.retention_period(self.retention_type, self.entity_resource_tags(), engine, custom_retention_types)
+        if period is None:
+            return
+        self.expire_date = self.date_created + period
+        self.tags[self._expire_at_tag_key()] = self.expire_date.strftime(self.TIMESTAMP_FORMAT)
+
+    @property
+    def expire_at_tag(self):
+        """Expire date stamped on backup, in TIMESTAMP_FORMAT, or None if backup was not stamped"""
+        return self.tags.get(self._expire_at_tag_key())
+
+    def _expire_at_tag_key(self):
+        tag_prefix = self.tags.get('shelvery:tag_name', RuntimeConfig.get_tag_prefix())
+        return f"{tag_prefix}:{self.EXPIRE_AT_TAG}"
+
     def is_stale(self, engine, custom_retention_types = None):
         self.calculate_expire_date(engine, custom_retention_types)
         now = datetime.now(self.date_created.tzinfo)
@@ -193,6 +288,17 @@ class BackupResource:
         self.tags['Name'] = self.name
         self.tags[f"{self.tags['shelvery:tag_name']}:retention_type"] = retention_type
 
+    @property
+    def changed_tags(self) -> Dict:
+        """Tags added or modified since tags were last persisted, or all tags if that is not known"""
+        if self._persisted_tags is None:
+            return dict(self.tags)
+        persisted = self._persisted_tags
+        return dict((k, v) for k, v in self.tags.items() if k not in persisted or persisted[k] != v)
+
+    def mark_tags_persisted(self):
+        self._persisted_tags = dict(self.tags)
+
     @property
     def boto3_tags(self):
         tags = self.tags
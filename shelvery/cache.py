@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class TtlCache:
+    """Thread safe key-value store, where entries expire after given number of seconds"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl):
+        """
+        Get value stored under key, if it was stored less than ttl seconds ago
+        :param key: cache key
+        :param ttl: maximum age of the entry in seconds
+        :return: cached value, or None if missing or expired
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            stored_at, value = self._entries[key]
+            if time.monotonic() - stored_at > ttl:
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,50 @@
+import heapq
+import itertools
+import threading
+
+
+class CopyScheduler:
+    """
+    Limits number of backup copies in progress to each destination region.
+    Copies over the limit wait in queue ordered by priority (lower first), and
+    by order of arrival within same priority. Thread safe.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._in_flight = {}
+        self._sequence = itertools.count()
+
+    def acquire(self, region: str, limit: int, priority: int = 0):
+        """
+        Block until copy to region can be started
+        :param region: destination region of the copy
+        :param limit: maximum number of copies in progress to region
+        :param priority: copies with lower priority value are started first
+        """
+        with self._condition:
+            job = (priority, next(self._sequence))
+            queue = self._queues.setdefault(region, [])
+            heapq.heappush(queue, job)
+            while queue[0] != job or self._in_flight.get(region, 0) >= max(limit, 1):
+                self._condition.wait()
+            heapq.heappop(queue)
+            self._in_flight[region] = self._in_flight.get(region, 0) + 1
+            # next job in queue may fit within limit as well
+            self._condition.notify_all()
+
+    def release(self, region: str):
+        """Mark copy to region as completed, allowing next queued copy to start"""
+        with self._condition:
+            self._in_flight[region] = self._in_flight.get(region, 0) - 1
+            self._condition.notify_all()
+
+    def metrics(self):
+        """Returns dictionary region -> {'queue_depth': int, 'in_flight': int}"""
+        with self._condition:
+            regions = set(self._queues.keys()) | set(self._in_flight.keys())
+            return dict((region, {
+                'queue_depth': len(self._queues.get(region, [])),
+                'in_flight': self._in_flight.get(region, 0)
+            }) for region in regions)
@@ -1,8 +1,7 @@
 import boto3
 
-from typing import List
+from typing import Dict, Iterator, List
 
-from botocore.exceptions import ClientError
 from shelvery.aws_helper import AwsHelper
 from shelvery.engine import SHELVERY_DO_BACKUP_TAGS
 from shelvery.ec2_backup import ShelveryEC2Backup
@@ -13,36 +12,52 @@ from shelvery.backup_resource import BackupResource
 class ShelveryEBSBackup(ShelveryEC2Backup):
     """Shelvery engine implementation for EBS data backups"""
 
-    def __init__(self):
-        ShelveryEC2Backup.__init__(self)
+    SNAPSHOTS_PAGE_SIZE = 1000
+    # maximum number of values in single describe_volumes filter
+    VOLUME_FILTER_BATCH_SIZE = 200
+
+    def __init__(self, region=None):
+        ShelveryEC2Backup.__init__(self, region)
 
     def delete_backup(self, backup_resource: BackupResource):
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         ec2client.delete_snapshot(SnapshotId=backup_resource.backup_id)
 
-    def get_existing_backups(self, tag_prefix: str) -> List[BackupResource]:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
-        # lookup snapshots by tags
-        snapshots = ec2client.describe_snapshots(Filters=[
-            {'Name': f"tag:{tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}", 'Values': ['true']}
-        ])
-        backups = []
-
-        # create backup resource objects
-        for snap in snapshots['Snapshots']:
-            backup = BackupResource.construct(
-                tag_prefix=tag_prefix,
-                backup_id=snap['SnapshotId'],
-                tags=dict(map(lambda t: (t['Key'], t['Value']), snap['Tags']))
-            )
-            # legacy code - entity id should be picked up from tags
-            if backup.entity_id is None:
-                backup.entity_id = snap['VolumeId']
-            backups.append(backup)
-
-        self.populate_volume_information(backups)
-
-        return backups
+    def get_existing_backups(self, tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        # volumes are looked up once, and shared by backups on all pages
+        volumes = {}
+        # lookup snapshots by tags, one page at a time
+        params = {
+            'Filters': [{'Name': f"tag:{tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}", 'Values': ['true']}],
+            'MaxResults': self.SNAPSHOTS_PAGE_SIZE
+        }
+        if entity_ids is not None:
+            params['Filters'].append({'Name': f"tag:{tag_prefix}:entity_id", 'Values': list(entity_ids)})
+        while True:
+            snapshots = ec2client.describe_snapshots(**params)
+            backups = []
+
+            # create backup resource objects
+            for snap in snapshots['Snapshots']:
+                backup = BackupResource.construct(
+                    tag_prefix=tag_prefix,
+                    backup_id=snap['SnapshotId'],
+                    tags=dict(map(lambda t: (t['Key'], t['Value']), snap['Tags'])),
+                    account_id=self.get_target_account_id()
+                )
+                # legacy code - entity id should be picked up from tags
+                if backup.entity_id is None:
+                    backup.entity_id = snap['VolumeId']
+                backups.append(backup)
+
+            self.populate_volume_information(backups, volumes)
+            yield from backups
+
+            if snapshots.get('NextToken'):
+                params['NextToken'] = snapshots['NextToken']
+            else:
+                break
 
     def get_engine_type(self) -> str:
         return 'ebs'
@@ -51,11 +66,12 @@ class ShelveryEBSBackup(ShelveryEC2Backup):
         return 'ec2 volume'
 
     def backup_resource(self, backup_resource: BackupResource) -> BackupResource:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         # create snapshot
         snap = ec2client.create_snapshot(
             VolumeId=backup_resource.entity_id,
-            Description=backup_resource.name
+            Description=backup_resource.name,
+            TagSpecifications=self.get_tag_specifications('snapshot', backup_resource.tags)
         )
         backup_resource.backup_id = snap['SnapshotId']
         return backup_resource
@@ -64,10 +80,10 @@ class ShelveryEBSBackup(ShelveryEC2Backup):
         ec2 = AwsHelper.boto3_session('ec2', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
         snapshot = ec2.Snapshot(backup_id)
         d_tags = dict(map(lambda t: (t['Key'], t['Value']), snapshot.tags))
-        return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags)
+        return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags, self.get_target_account_id())
 
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
-        volumes = self.collect_volumes(tag_name)
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
+        volumes = self.collect_volumes(tag_name, entity_ids)
         return list(
             map(
                 lambda vol: EntityResource(
@@ -90,44 +106,53 @@ class ShelveryEBSBackup(ShelveryEC2Backup):
         except Exception as e:
             self.logger.warn(f"Problem getting status of ec2 snapshot status for snapshot {backup_id}:{e}")
 
-    def copy_backup_to_region(self, backup_id: str, region: str):
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None):
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         snapshot = ec2client.describe_snapshots(SnapshotIds=[backup_id])['Snapshots'][0]
         regional_client = AwsHelper.boto3_client('ec2', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
         copy_snapshot_response = regional_client.copy_snapshot(SourceSnapshotId=backup_id,
                                                                SourceRegion=ec2client._client_config.region_name,
                                                                DestinationRegion=region,
-                                                               Description=snapshot['Description'])
+                                                               Description=snapshot['Description'],
+                                                               TagSpecifications=self.get_tag_specifications('snapshot', tags))
 
         # return id of newly created snapshot in dr region
         return copy_snapshot_response['SnapshotId']
 
     def share_backup_with_account(self, backup_region: str, backup_id: str, aws_account_id: str):
+        self.share_backup_with_accounts(backup_region, backup_id, [aws_account_id])
+
+    def share_backup_with_accounts(self, backup_region: str, backup_id: str, aws_account_ids: List[str]):
         ec2 = AwsHelper.boto3_session('ec2', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         snapshot = ec2.Snapshot(backup_id)
         snapshot.modify_attribute(Attribute='createVolumePermission',
                                   CreateVolumePermission={
-                                      'Add': [{'UserId': aws_account_id}]
+                                      'Add': [{'UserId': aws_account_id} for aws_account_id in aws_account_ids]
                                   },
-                                  UserIds=[aws_account_id],
+                                  UserIds=list(aws_account_ids),
                                   OperationType='add')
 
-    def copy_shared_backup(self, source_account: str, source_backup: BackupResource):
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+    def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None):
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         snap = ec2client.copy_snapshot(
             SourceSnapshotId=source_backup.backup_id,
-            SourceRegion=source_backup.region
+            SourceRegion=source_backup.region,
+            TagSpecifications=self.get_tag_specifications('snapshot', tags)
         )
         return snap['SnapshotId']
     # collect all volumes tagged with given tag, in paginated manner
-    def collect_volumes(self, tag_name: str):
+    # volume ids are filtered rather than passed as VolumeIds, so unknown volume ids do not fail the call
+    def collect_volumes(self, tag_name: str, volume_ids: List[str] = None):
         load_volumes = True
         next_token = ''
         all_volumes = []
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+        filters = [{'Name': f"tag:{tag_name}", 'Values': SHELVERY_DO_BACKUP_TAGS}]
+        if volume_ids is not None:
+            filters.append({'Name': 'volume-id', 'Values': list(volume_ids)})
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         while load_volumes:
             tagged_volumes = ec2client.describe_volumes(
-                Filters=[{'Name': f"tag:{tag_name}", 'Values': SHELVERY_DO_BACKUP_TAGS}],
+                Filters=filters,
                 NextToken=next_token
             )
             all_volumes = all_volumes + tagged_volumes['Volumes']
@@ -139,29 +164,31 @@ class ShelveryEBSBackup(ShelveryEC2Backup):
 
         return all_volumes
 
-    def populate_volume_information(self, backups):
-        volume_ids = []
-        volumes = {}
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
-        local_region = boto3.session.Session().region_name
-
-        # create list of all volume ids
-        for backup in backups:
-            if backup.entity_id not in volume_ids:
-                volume_ids.append(backup.entity_id)
-
-        # populate map volumeid->volume if present
-        for volume_id in volume_ids:
-            try:
-                volume = ec2client.describe_volumes(VolumeIds=[volume_id])['Volumes'][0]
-                d_tags = dict(map(lambda t: (t['Key'], t['Value']), volume['Tags']))
-                volumes[volume_id] = EntityResource(volume_id, local_region, volume['CreateTime'], d_tags)
-            except ClientError as e:
-                if 'InvalidVolume.NotFound' in str(e):
-                    volumes[volume_id] = EntityResource.empty()
+    def populate_volume_information(self, backups, volumes=None):
+        """
+        Join backups with volumes they were taken from
+        :param backups: backups to populate entity resource of
+        :param volumes: map volume id->entity resource of volumes already looked up, updated in place
+        """
+        volumes = {} if volumes is None else volumes
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        local_region = self.region
+
+        # volume ids not looked up yet, in order of appearance
+        volume_ids = list(dict.fromkeys(backup.entity_id for backup in backups if backup.entity_id not in volumes))
+
+        # populate map volumeid->volume if present. Filtering by volume id does not fail on deleted volumes
+        for i in range(0, len(volume_ids), self.VOLUME_FILTER_BATCH_SIZE):
+            batch = volume_ids[i:i + self.VOLUME_FILTER_BATCH_SIZE]
+            response = ec2client.describe_volumes(Filters=[{'Name': 'volume-id', 'Values': batch}])
+            for volume in response['Volumes']:
+                d_tags = dict(map(lambda t: (t['Key'], t['Value']), volume.get('Tags', [])))
+                volumes[volume['VolumeId']] = EntityResource(volume['VolumeId'], local_region, volume['CreateTime'], d_tags)
+            for volume_id in batch:
+                if volume_id not in volumes:
+                    # volume has been deleted since snapshot was taken
+                    volumes[volume_id] = EntityResource.empty(self.region)
                     volumes[volume_id].resource_id = volume_id
-                else:
-                    raise e
 
         # add info to backup resource objects
         for backup in backups:
@@ -1,31 +1,64 @@
-import boto3
-
 from shelvery.backup_resource import BackupResource
 from shelvery.engine import ShelveryEngine
 from shelvery.entity_resource import EntityResource
 from shelvery.aws_helper import AwsHelper
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
 
 class ShelveryEC2Backup(ShelveryEngine):
     """Parent class sharing common functionality for AMI and EBS backups"""
 
-    def __init__(self):
-        ShelveryEngine.__init__(self)
-        # default region will be picked up in AwsHelper.boto3_client call
-        self.region = boto3.session.Session().region_name
+    # maximum number of resource ids accepted by create_tags call
+    MAX_TAG_RESOURCES = 1000
+
+    def __init__(self, region=None):
+        ShelveryEngine.__init__(self, region)
+
+    @staticmethod
+    def get_tag_specifications(resource_type: str, tags: Dict) -> List[Dict]:
+        """Tags in TagSpecifications format, for EC2 API calls that tag resources on creation"""
+        if not tags:
+            return []
+        return [{
+            'ResourceType': resource_type,
+            'Tags': list(map(lambda k: {'Key': k, 'Value': tags[k]}, tags))
+        }]
 
     def tag_backup_resource(self, backup_resource: BackupResource):
-        regional_client = AwsHelper.boto3_client('ec2', region_name=backup_resource.region, arn=self.role_arn, external_id=self.role_external_id)
-        regional_client.create_tags(
-            Resources=[backup_resource.backup_id],
-            Tags=list(map(lambda k: {'Key': k, 'Value': backup_resource.tags[k]}, backup_resource.tags))
-        )
+        self.tag_backup_resources([backup_resource])
+
+    def tag_backup_resources(self, backup_resources: List[BackupResource]):
+        # collect resource ids per changed tag key/value pair, so tag shared
+        # by many backups (e.g. retention type or dr regions) is created
+        # within single create_tags call, and tags unique to backup fall back
+        # to call for that resource only
+        pair_ids = {}
+        for backup_resource in backup_resources:
+            for key, value in backup_resource.changed_tags.items():
+                pair_ids.setdefault((backup_resource.region, key, value), []).append(backup_resource.backup_id)
+
+        # tag pairs applying to exactly same set of resources are sent together
+        groups = {}
+        for (region, key, value), backup_ids in pair_ids.items():
+            groups.setdefault((region, tuple(backup_ids)), []).append({'Key': key, 'Value': value})
+
+        for (region, backup_ids), tags in groups.items():
+            regional_client = AwsHelper.boto3_client('ec2', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
+            for i in range(0, len(backup_ids), self.MAX_TAG_RESOURCES):
+                regional_client.create_tags(
+                    Resources=list(backup_ids[i:i + self.MAX_TAG_RESOURCES]),
+                    Tags=tags
+                )
+        if len(groups) > 0:
+            self.logger.info(f"Tagged {len(backup_resources)} backups using {len(groups)} create_tags groups")
+
+        for backup_resource in backup_resources:
+            backup_resource.mark_tags_persisted()
 
     def delete_backup(self, backup_resource: BackupResource):
         pass
 
-    def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
+    def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
         pass
 
     def get_resource_type(self) -> str:
@@ -34,13 +67,13 @@ class ShelveryEC2Backup(ShelveryEngine):
     def backup_resource(self, backup_resource: BackupResource):
         pass
 
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
         pass
 
     def is_backup_available(self, backup_region: str, backup_id: str) -> bool:
         pass
 
-    def copy_backup_to_region(self, backup_id: str, region: str) -> str:
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
         pass
 
     def get_backup_resource(self, region: str, backup_id: str) -> BackupResource:
@@ -1,7 +1,5 @@
 from functools import reduce
-from typing import List
-
-import boto3
+from typing import Dict, Iterator, List
 
 from shelvery.aws_helper import AwsHelper
 from shelvery.backup_resource import BackupResource
@@ -27,27 +25,39 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
         for snapshot in snapshots:
             regional_client.delete_snapshot(SnapshotId=snapshot)
 
-    def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
-        amis = ec2client.describe_images(Filters=[
-            {'Name': f"tag:{backup_tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}", 'Values': ['true']}
-        ])['Images']
-        backups = []
-        instances = dict(map(
-            lambda x: (x.resource_id, x),
-            self._get_all_entities()
-        ))
-        for ami in amis:
-            backup = BackupResource.construct(backup_tag_prefix,
-                                              ami['ImageId'],
-                                              dict(map(lambda x: (x['Key'], x['Value']), ami['Tags'])))
-
-            if backup.entity_id in instances:
-                backup.entity_resource = instances[backup.entity_id]
-
-            backups.append(backup)
-
-        return backups
+    def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        params = {
+            'Filters': [{'Name': f"tag:{backup_tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}", 'Values': ['true']}]
+        }
+        if entity_ids is not None:
+            params['Filters'].append({'Name': f"tag:{backup_tag_prefix}:entity_id", 'Values': list(entity_ids)})
+        instances = {}
+        instances_listed = False
+        while True:
+            images = ec2client.describe_images(**params)
+            # instances are listed once, on first page with images, which may follow empty pages
+            if not instances_listed and len(images['Images']) > 0:
+                instances.update(map(
+                    lambda x: (x.resource_id, x),
+                    self._get_all_entities(entity_ids)
+                ))
+                instances_listed = True
+            for ami in images['Images']:
+                backup = BackupResource.construct(backup_tag_prefix,
+                                                  ami['ImageId'],
+                                                  dict(map(lambda x: (x['Key'], x['Value']), ami['Tags'])),
+                                                  self.get_target_account_id())
+
+                if backup.entity_id in instances:
+                    backup.entity_resource = instances[backup.entity_id]
+
+                yield backup
+
+            if images.get('NextToken'):
+                params['NextToken'] = images['NextToken']
+            else:
+                break
 
     def get_resource_type(self) -> str:
         return 'Amazon Machine Image'
@@ -55,13 +65,14 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
     def get_engine_type(self) -> str:
         return 'ec2ami'
 
-    def copy_shared_backup(self, source_account: str, source_backup: BackupResource):
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+    def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None):
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         ami = ec2client.copy_image(
-            ClientToken=f"{AwsHelper.local_account_id()}{source_account}{source_backup.backup_id}",
+            ClientToken=f"{self.get_target_account_id()}{source_account}{source_backup.backup_id}",
             SourceImageId=source_backup.backup_id,
             SourceRegion=source_backup.region,
-            Name=source_backup.backup_id
+            Name=source_backup.backup_id,
+            TagSpecifications=self.get_tag_specifications('image', tags)
         )
         return ami['ImageId']
 
@@ -72,50 +83,50 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
             Name=backup_resource.name,
             Description=f"Shelvery created backup for {backup_resource.entity_id}",
             InstanceId=backup_resource.entity_id,
-
+            # only image is tagged, so ebs engine does not pick up image snapshots as its own backups
+            TagSpecifications=self.get_tag_specifications('image', backup_resource.tags)
         )
         backup_resource.backup_id = ami['ImageId']
         return backup_resource
 
-    def _get_all_entities(self) -> List[EntityResource]:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
-        instances = ec2client.describe_instances()
-        while 'NextToken' in instances:
-            instances += ec2client.describe_instances(
-                NextToken=instances['NextToken']
-            )
-        return self._convert_instances_to_entities(instances)
-
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
-        instances = ec2client.describe_instances(
-            Filters=[
-                {
-                    'Name': f"tag:{tag_name}",
-                    'Values': SHELVERY_DO_BACKUP_TAGS
-                }
-            ]
-        )
-        while 'NextToken' in instances:
-            instances += ec2client.describe_instances(
-                Filters=[
-                    {
-                        'Name': f"tag:{tag_name}",
-                        'Values': SHELVERY_DO_BACKUP_TAGS
-                    }
-                ],
+    def _get_all_entities(self, instance_ids: List[str] = None) -> List[EntityResource]:
+        filters = []
+        if instance_ids is not None:
+            filters.append({'Name': 'instance-id', 'Values': list(instance_ids)})
+        return self._describe_instances(filters)
+
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
+        filters = [
+            {
+                'Name': f"tag:{tag_name}",
+                'Values': SHELVERY_DO_BACKUP_TAGS
+            }
+        ]
+        # instance ids are filtered rather than passed as InstanceIds, so unknown ids do not fail the call
+        if entity_ids is not None:
+            filters.append({'Name': 'instance-id', 'Values': list(entity_ids)})
+        return self._describe_instances(filters)
+
+    def _describe_instances(self, filters: List[Dict]) -> List[EntityResource]:
+        ec2client = AwsHelper.boto3_client('ec2', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        instances = ec2client.describe_instances(Filters=filters)
+        reservations = instances['Reservations']
+        while instances.get('NextToken'):
+            instances = ec2client.describe_instances(
+                Filters=filters,
                 NextToken=instances['NextToken']
             )
+            reservations.extend(instances['Reservations'])
 
-        return self._convert_instances_to_entities(instances)
+        return self._convert_instances_to_entities({'Reservations': reservations}, self.region)
 
     @staticmethod
-    def _convert_instances_to_entities(instances):
+    def _convert_instances_to_entities(instances, local_region):
         """
         Params:
             instances: a list of Reservations (i.e. the response from `aws ec2 describe-instances`)
+            local_region: region instances were described in
         """
-        local_region = boto3.session.Session().region_name
 
         entities = []
         for reservation in instances['Reservations']:
@@ -135,8 +146,8 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
 
         return False
 
-    def copy_backup_to_region(self, backup_id: str, region: str) -> str:
-        local_region = boto3.session.Session().region_name
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
+        local_region = self.region
         local_client = AwsHelper.boto3_client('ec2', region_name=local_region, arn=self.role_arn, external_id=self.role_external_id)
         regional_client = AwsHelper.boto3_client('ec2', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
         ami = local_client.describe_images(ImageIds=[backup_id])['Images'][0]
@@ -145,27 +156,31 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
                                           ClientToken=idempotency_token,
                                           Description=f"Shelvery copy of {backup_id} to {region} from {local_region}",
                                           SourceImageId=backup_id,
-                                          SourceRegion=local_region
+                                          SourceRegion=local_region,
+                                          TagSpecifications=self.get_tag_specifications('image', tags)
                                           )['ImageId']
 
     def get_backup_resource(self, region: str, backup_id: str) -> BackupResource:
-        ec2client = AwsHelper.boto3_client('ec2', arn=self.role_arn, external_id=self.role_external_id)
+        ec2client = AwsHelper.boto3_client('ec2', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
         ami = ec2client.describe_images(ImageIds=[backup_id])['Images'][0]
 
         d_tags = dict(map(lambda x: (x['Key'], x['Value']), ami['Tags']))
         backup_tag_prefix = d_tags['shelvery:tag_name']
 
-        backup = BackupResource.construct(backup_tag_prefix, backup_id, d_tags)
+        backup = BackupResource.construct(backup_tag_prefix, backup_id, d_tags, self.get_target_account_id())
         return backup
 
     def share_backup_with_account(self, backup_region: str, backup_id: str, aws_account_id: str):
+        self.share_backup_with_accounts(backup_region, backup_id, [aws_account_id])
+
+    def share_backup_with_accounts(self, backup_region: str, backup_id: str, aws_account_ids: List[str]):
         ec2 = AwsHelper.boto3_session('ec2', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         image = ec2.Image(backup_id)
         image.modify_attribute(Attribute='launchPermission',
                                LaunchPermission={
-                                   'Add': [{'UserId': aws_account_id}]
+                                   'Add': [{'UserId': aws_account_id} for aws_account_id in aws_account_ids]
                                },
-                               UserIds=[aws_account_id],
+                               UserIds=list(aws_account_ids),
                                OperationType='add')
         for bdm in image.block_device_mappings:
             if 'Ebs' in bdm:
@@ -173,7 +188,7 @@ class ShelveryEC2AMIBackup(ShelveryEC2Backup):
                 snapshot = ec2.Snapshot(snap_id)
                 snapshot.modify_attribute(Attribute='createVolumePermission',
                                           CreateVolumePermission={
-                                              'Add': [{'UserId': aws_account_id}]
+                                              'Add': [{'UserId': aws_account_id} for aws_account_id in aws_account_ids]
                                           },
-                                          UserIds=[aws_account_id],
+                                          UserIds=list(aws_account_ids),
                                           OperationType='add')
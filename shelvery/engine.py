@@ -2,14 +2,14 @@ import abc
 import logging
 import time
 import sys
+import threading
 
 import botocore
-import yaml
 import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
 
-from typing import List, Dict
+from typing import Iterator, List, Dict
 from abc import abstractmethod
 from abc import abstractclassmethod
 
@@ -19,6 +19,10 @@ from shelvery.shelvery_invoker import ShelveryInvoker
 from shelvery.runtime_config import RuntimeConfig
 from shelvery.backup_resource import BackupResource
 from shelvery.entity_resource import EntityResource
+from shelvery.cache import TtlCache
+from shelvery.copy_scheduler import CopyScheduler
+from shelvery.retention import RetentionEvaluator
+from shelvery.resource_discovery import TaggedResourceDiscovery
 
 from shelvery import LAMBDA_WAIT_ITERATION
 from shelvery import S3_DATA_PREFIX
@@ -37,7 +41,35 @@ class ShelveryEngine:
 
     BACKUP_RESOURCE_TAG = 'create_backup'
 
-    def __init__(self):
+    # number of backups tagged together when stamping expire dates on existing backups
+    BACKFILL_BATCH_SIZE = 1000
+
+    # number of discovered entities described in single call, within filter value limits of describe apis
+    DISCOVERY_BATCH_SIZE = 100
+
+    # seconds to wait before retrying copy rejected due to number of copies in progress
+    COPY_RETRY_SECONDS = 30
+
+    # number of times copy rejected due to number of copies in progress is retried, before it is reported as failed
+    COPY_MAX_RETRIES = 10
+
+    # describe and tag results of backups, shared by all engines within process
+    backup_resource_cache = TtlCache()
+
+    # names of data buckets known to exist, shared by all engines within process
+    verified_data_buckets = set()
+
+    # handles of verified data buckets, kept per thread as boto3 resources are not thread safe.
+    # handles live as long as process, so warm lambda containers do not create s3 resource again
+    _data_bucket_handles = threading.local()
+
+    # limits copies in progress per destination region, shared by all engines within process
+    copy_scheduler = CopyScheduler()
+
+    def __init__(self, region=None):
+        """
+        :param region: region engine manages backups in, defaults to region of boto3 session
+        """
         # system logger
         FORMAT = "%(asctime)s %(process)s %(thread)s: %(message)s"
         logging.basicConfig(format=FORMAT)
@@ -50,23 +82,48 @@ class ShelveryEngine:
         self.lambda_context = None
         self.role_arn = None
         self.role_external_id = None
-        self.account_id = AwsHelper.local_account_id()
-        self.region = AwsHelper.local_region()
-        self.snspublisher = ShelveryNotification(RuntimeConfig.get_sns_topic(self))
-        self.snspublisher_error = ShelveryNotification(RuntimeConfig.get_error_sns_topic(self))
+        self.resolved_config = None
+        self.region = region if region is not None else AwsHelper.local_region()
+        # account and notification topics are looked up on first use, as not all actions need them
+        self._account_id = None
+        self._snspublisher = None
+        self._snspublisher_error = None
+
+    @property
+    def account_id(self):
+        if self._account_id is None:
+            self._account_id = AwsHelper.local_account_id()
+        return self._account_id
+
+    @property
+    def snspublisher(self):
+        if self._snspublisher is None:
+            self._snspublisher = ShelveryNotification(RuntimeConfig.get_sns_topic(self))
+        return self._snspublisher
+
+    @property
+    def snspublisher_error(self):
+        if self._snspublisher_error is None:
+            self._snspublisher_error = ShelveryNotification(RuntimeConfig.get_error_sns_topic(self))
+        return self._snspublisher_error
 
     def set_lambda_environment(self, payload, context):
         self.lambda_payload   = payload
         self.lambda_context   = context
         self.aws_request_id   = context.aws_request_id
+        self.refresh_config()
         self.role_arn         = RuntimeConfig.get_role_arn(self)
         self.role_external_id = RuntimeConfig.get_role_external_id(self)
         if ('arguments' in payload) and (LAMBDA_WAIT_ITERATION in payload['arguments']):
             self.lambda_wait_iteration = payload['arguments'][LAMBDA_WAIT_ITERATION]
 
+    def refresh_config(self):
+        """Resolve configuration once for operation about to run, rather than on every lookup"""
+        self.resolved_config = RuntimeConfig.resolve(self.lambda_payload)
+
     def get_bucket_name(self, account_id=None, region=None):
         if account_id is None:
-            account_id = self.account_id
+            account_id = self.get_target_account_id()
         if region is None:
             region = self.region
         template = RuntimeConfig.get_bucket_name_template(self)
@@ -78,22 +135,73 @@ class ShelveryEngine:
     def get_remote_bucket_name(self, account_id, remote_region=None):
         return self.get_bucket_name(account_id=account_id, region=remote_region)
 
+    def get_target_account_id(self):
+        """Account backups are managed in - account of assumed role, if running with one"""
+        if self.role_arn is not None:
+            return self.role_arn.split(':')[4]
+        return self.account_id
+
+    def _backup_resource_cache_key(self, backup_region, backup_id):
+        return self.get_engine_type(), self.role_arn, backup_region, backup_id
+
+    def get_cached_backup_resource(self, backup_region: str, backup_id: str) -> BackupResource:
+        """
+        Read-through cache for get_backup_resource. Results are kept for shelvery_describe_cache_ttl
+        seconds, so backup is described about once per run while being copied, shared and stored
+        """
+        key = self._backup_resource_cache_key(backup_region, backup_id)
+        backup_resource = self.backup_resource_cache.get(key, RuntimeConfig.get_describe_cache_ttl(self))
+        if backup_resource is None:
+            backup_resource = self.get_backup_resource(backup_region, backup_id)
+            self.backup_resource_cache.put(key, backup_resource)
+
+        # callers are free to modify returned object
+        return backup_resource.shallow_copy()
+
+    def cache_backup_resource(self, backup_resource: BackupResource):
+        """Store backup in describe cache, after its tags have been updated"""
+        self.backup_resource_cache.put(
+            self._backup_resource_cache_key(backup_resource.region, backup_resource.backup_id),
+            backup_resource.shallow_copy()
+        )
+
     def _get_data_bucket(self, region=None):
         bucket_name = self.get_local_bucket_name(region)
         if region is None:
-            loc_constraint = boto3.session.Session().region_name
+            loc_constraint = self.region
         else:
             loc_constraint = region
 
-        s3 = boto3.resource('s3')
+        # data bucket is in account backups are managed in. Handles of assumed role are
+        # recreated once role credentials are renewed
+        access_key_id = None
+        if self.role_arn is not None:
+            access_key_id = AwsHelper.boto3_sts(self.role_arn, self.role_external_id)['AccessKeyId']
+        handle_key = (bucket_name, access_key_id)
+
+        handles = getattr(self._data_bucket_handles, 'buckets', None)
+        if handles is None:
+            handles = self._data_bucket_handles.buckets = {}
+        if handle_key in handles:
+            return handles[handle_key]
+
+        # session per thread, as resources of default session are not safe to create from multiple threads
+        s3 = AwsHelper.boto3_session('s3', arn=self.role_arn, external_id=self.role_external_id)
+
+        # existence of bucket is checked once, by first engine within process using it
+        if bucket_name in self.verified_data_buckets:
+            handles[handle_key] = s3.Bucket(bucket_name)
+            return handles[handle_key]
+
         try:
-            AwsHelper.boto3_client('s3').head_bucket(Bucket=bucket_name)
+            AwsHelper.boto3_client('s3', arn=self.role_arn, external_id=self.role_external_id).head_bucket(Bucket=bucket_name)
             bucket = s3.Bucket(bucket_name)
 
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
                 client_region = loc_constraint
-                s3client = AwsHelper.boto3_client('s3', region_name=client_region)
+                s3client = AwsHelper.boto3_client('s3', region_name=client_region,
+                                                  arn=self.role_arn, external_id=self.role_external_id)
                 if loc_constraint == "us-east-1":
                     bucket = s3client.create_bucket(Bucket=bucket_name)
                 else:
@@ -108,16 +216,19 @@ class ShelveryEngine:
                 # that backups are shared with
                 s3client.put_bucket_policy(Bucket=bucket_name,
                                            Policy=AwsHelper.get_shelvery_bucket_policy(
-                                               self.account_id,
+                                               self.get_target_account_id(),
                                                RuntimeConfig.get_share_with_accounts(self),
                                                bucket_name)
                                            )
-                return s3.Bucket(bucket_name)
+                bucket = s3.Bucket(bucket_name)
             else:
                 raise e
+        self.verified_data_buckets.add(bucket_name)
+        handles[handle_key] = bucket
         return bucket
 
     def _archive_backup_metadata(self, backup, bucket, shared_accounts=[]):
+        import yaml
         s3key = f"{S3_DATA_PREFIX}/{self.get_engine_type()}/{backup.name}.yaml"
         s3archive_key = f"{S3_DATA_PREFIX}/{self.get_engine_type()}/removed/{backup.name}.yaml"
         bucket.put_object(
@@ -137,6 +248,7 @@ class ShelveryEngine:
                          f" s3://{bucket.name}/{s3archive_key}")
 
     def _write_backup_data(self, backup, bucket, shared_account_id=None):
+        import yaml
         s3key = f"{S3_DATA_PREFIX}/{self.get_engine_type()}/{backup.name}.yaml"
         if shared_account_id is not None:
             s3key = f"{S3_DATA_PREFIX}/shared/{shared_account_id}/{self.get_engine_type()}/{backup.name}.yaml"
@@ -151,34 +263,37 @@ class ShelveryEngine:
     ### Top level methods, invoked externally ####
     def create_backups(self) -> List[BackupResource]:
         """Create backups from all collected entities marked for backup by using specific tag"""
+        self.refresh_config()
 
         # collect resources to be backed up
         resource_type = self.get_resource_type()
         self.logger.info(f"Collecting entities of type {resource_type} tagged with "
                          f"{RuntimeConfig.get_tag_prefix()}:{self.BACKUP_RESOURCE_TAG}")
-        resources = self.get_entities_to_backup(f"{RuntimeConfig.get_tag_prefix()}:{self.BACKUP_RESOURCE_TAG}")
-
-        # allows user to select single entity to be backed up
-        if RuntimeConfig.get_shelvery_select_entity(self) is not None:
-            entity_id = RuntimeConfig.get_shelvery_select_entity(self)
-            self.logger.info(f"Creating backups only for entity {entity_id}")
-            resources = list(
-                filter(
-                    lambda x: x.resource_id == entity_id,
-                    resources)
-            )
+        tag_name = f"{RuntimeConfig.get_tag_prefix()}:{self.BACKUP_RESOURCE_TAG}"
+        # allows user to select entities to be backed up, engines query only selected entities
+        select_entities = RuntimeConfig.get_shelvery_select_entities(self)
+        if len(select_entities) > 0:
+            self.logger.info(f"Creating backups only for entities {', '.join(select_entities)}")
+            resources = self.get_entities_to_backup(tag_name, select_entities)
+            resources = [r for r in resources if r.resource_id in select_entities]
+        elif RuntimeConfig.use_tagged_resource_discovery(self):
+            resources = self.get_discovered_entities_to_backup(tag_name)
+        else:
+            resources = self.get_entities_to_backup(tag_name)
 
         self.logger.info(f"{len(resources)} resources of type {resource_type} collected for backup")
 
         # create and collect backups
         backup_resources = []
         current_retention_type = RuntimeConfig.get_current_retention_type(self)
+        custom_retention_types = RuntimeConfig.get_custom_retention_types(self)
         for r in resources:
             backup_resource = BackupResource(
                 tag_prefix=RuntimeConfig.get_tag_prefix(),
                 entity_resource=r,
                 copy_resource_tags=RuntimeConfig.copy_resource_tags(self),
-                exluded_resource_tag_keys=RuntimeConfig.get_exluded_resource_tag_keys(self)
+                exluded_resource_tag_keys=RuntimeConfig.get_exluded_resource_tag_keys(self),
+                account_id=self.get_target_account_id()
             )
             # if retention is explicitly given by runtime environment
             if current_retention_type is not None:
@@ -190,8 +305,10 @@ class ShelveryEngine:
             self.logger.info(f"Creating backup {backup_resource.name}")
 
             try:
+                backup_resource.stamp_expire_date(self, custom_retention_types)
+                # backup is tagged on creation
                 self.backup_resource(backup_resource)
-                self.tag_backup_resource(backup_resource)
+                backup_resource.mark_tags_persisted()
                 self.logger.info(f"Created backup of type {resource_type} for entity {backup_resource.entity_id} "
                                  f"with id {backup_resource.backup_id}")
                 backup_resources.append(backup_resource)
@@ -241,27 +358,40 @@ class ShelveryEngine:
         for br in backup_resources:
             self.copy_backup(br, RuntimeConfig.get_dr_regions(br.entity_resource.tags, self))
 
-        for aws_account_id in RuntimeConfig.get_share_with_accounts(self):
+        # each backup is shared with all accounts at once
+        share_with_accounts = RuntimeConfig.get_share_with_accounts(self)
+        if len(share_with_accounts) > 0:
             for br in backup_resources:
-                self.share_backup(br, aws_account_id)
+                self.share_backup(br, share_with_accounts)
 
         return backup_resources
 
+    def get_discovered_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+        """
+        Entities tagged for backup, as found by tagging api discovery shared by all engines. Discovered
+        entities are described by id in batches, so engines skip deleted entities and apply their own checks
+        """
+        tagged_resources = TaggedResourceDiscovery.tagged_resources(self, tag_name)
+        entity_ids = list(tagged_resources[self.get_engine_type()].keys())
+        self.logger.info(f"{len(entity_ids)} resources of type {self.get_resource_type()} discovered with tagging api")
+
+        entities = []
+        for i in range(0, len(entity_ids), self.DISCOVERY_BATCH_SIZE):
+            entities.extend(self.get_entities_to_backup(tag_name, entity_ids[i:i + self.DISCOVERY_BATCH_SIZE]))
+        return entities
+
     def clean_backups(self):
+        self.refresh_config()
+        # allows user to select entities backups are cleaned for, engines list only their backups
+        select_entities = RuntimeConfig.get_shelvery_select_entities(self)
+        if len(select_entities) > 0:
+            self.logger.info(f"Checking only for backups of entities {', '.join(select_entities)}")
+
         # collect backups
-        existing_backups = self.get_existing_backups(RuntimeConfig.get_tag_prefix())
-
-        # allows user to select single entity backups to be cleaned
-        if RuntimeConfig.get_shelvery_select_entity(self) is not None:
-            entity_id = RuntimeConfig.get_shelvery_select_entity(self)
-            self.logger.info(f"Checking only for backups of entity {entity_id}")
-            existing_backups = list(
-                filter(
-                    lambda x: x.entity_id == entity_id,
-                    existing_backups)
-            )
+        existing_backups = self.get_existing_backups(RuntimeConfig.get_tag_prefix(), select_entities or None)
+        if len(select_entities) > 0:
+            existing_backups = (backup for backup in existing_backups if backup.entity_id in select_entities)
 
-        self.logger.info(f"Collected {len(existing_backups)} backups to be checked for expiry date")
         self.logger.info(f"""Using following retention settings from runtime environment (resource overrides enabled):
                             Keeping last {RuntimeConfig.get_keep_daily(None, self)} daily backups
                             Keeping last {RuntimeConfig.get_keep_weekly(None, self)} weekly backups
@@ -269,15 +399,26 @@ class ShelveryEngine:
                             Keeping last {RuntimeConfig.get_keep_yearly(None, self)} yearly backups""")
 
         # check backups for expire date, delete if necessary
-        for backup in existing_backups:
+        # backups are streamed from engine, so deletion starts while listing is still in progress
+        # retention is resolved once per retention type and entity configuration
+        checked_backups = 0
+        data_bucket = None
+        evaluator = RetentionEvaluator(self)
+        for backup, is_stale, error in evaluator.evaluate(existing_backups):
+            checked_backups += 1
             self.logger.info(f"Checking backup {backup.backup_id}")
             try:
-                if backup.is_stale(self, RuntimeConfig.get_custom_retention_types(self)):
+                if error is not None:
+                    raise error
+                if is_stale:
                     self.logger.info(
                         f"{backup.retention_type} backup {backup.name} has expired on {backup.expire_date}, cleaning up")
                     self.delete_backup(backup)
                     backup.date_deleted = datetime.utcnow()
-                    self._archive_backup_metadata(backup, self._get_data_bucket(), RuntimeConfig.get_share_with_accounts(self))
+                    # bucket is looked up once, on first deletion
+                    if data_bucket is None:
+                        data_bucket = self._get_data_bucket()
+                    self._archive_backup_metadata(backup, data_bucket, RuntimeConfig.get_share_with_accounts(self))
                     self.snspublisher.notify({
                         'Operation': 'DeleteBackup',
                         'Status': 'OK',
@@ -297,7 +438,40 @@ class ShelveryEngine:
                 })
                 self.logger.exception(f"Error checking backup {backup.backup_id} for cleanup: {e}")
 
+        self.logger.info(f"Checked {checked_backups} backups for expiry date")
+
+    def backfill_expire_dates(self):
+        """
+        Stamp expire date tag on existing backups created before it was introduced, so cleanup
+        may rely on it when shelvery_trust_expire_at_tag is enabled. Expire date is resolved from
+        current retention configuration
+        """
+        self.refresh_config()
+        custom_retention_types = RuntimeConfig.get_custom_retention_types(self)
+        stamped = 0
+        batch = []
+        for backup in self.get_existing_backups(RuntimeConfig.get_tag_prefix()):
+            if backup.expire_at_tag is not None:
+                continue
+            try:
+                backup.stamp_expire_date(self, custom_retention_types)
+            except Exception as e:
+                self.logger.exception(f"Failed to resolve expire date of backup {backup.backup_id}: {e}")
+                continue
+            if backup.expire_at_tag is not None:
+                batch.append(backup)
+            if len(batch) >= self.BACKFILL_BATCH_SIZE:
+                self.tag_backup_resources(batch)
+                stamped += len(batch)
+                batch = []
+        if len(batch) > 0:
+            self.tag_backup_resources(batch)
+            stamped += len(batch)
+        self.logger.info(f"Stamped expire date on {stamped} backups")
+
     def pull_shared_backups(self):
+        import yaml
+        self.refresh_config()
         account_id = self.account_id
         s3_client = AwsHelper.boto3_client('s3')
         accounts = RuntimeConfig.get_source_backup_accounts(self)
@@ -340,9 +514,10 @@ class ShelveryEngine:
                             Bucket=bucket_name,
                             Key=backup_object['Key'])['Body'].read()
                         shared_backup = yaml.load(serialised_shared_backup)
-                        new_backup_id = self.copy_shared_backup(src_account_id, shared_backup)
-                        new_backup = shared_backup.cross_account_copy(new_backup_id)
-                        self.tag_backup_resource(new_backup)
+                        # backup copy is tagged on creation
+                        new_backup = shared_backup.cross_account_copy(None, self.region)
+                        new_backup.backup_id = self.copy_shared_backup(src_account_id, shared_backup, new_backup.tags)
+                        new_backup.mark_tags_persisted()
                         self.store_backup_data(new_backup)
                         regional_client.delete_object(Bucket=bucket_name, Key=backup_object['Key'])
                         self.logger.info(f"Removed s3://{bucket_name}/{backup_object['Key']}")
@@ -392,13 +567,15 @@ class ShelveryEngine:
                 self.logger.exception("Failed to pull shared backups")
 
     def create_data_buckets(self):
+        self.refresh_config()
         regions = [self.region]
         regions.extend(RuntimeConfig.get_dr_regions(None, self))
         for region in regions:
             bucket = self._get_data_bucket(region)
-            AwsHelper.boto3_client('s3', region_name=region).put_bucket_policy(Bucket=bucket.name,
+            AwsHelper.boto3_client('s3', region_name=region, arn=self.role_arn,
+                                   external_id=self.role_external_id).put_bucket_policy(Bucket=bucket.name,
                                                  Policy=AwsHelper.get_shelvery_bucket_policy(
-                                                     self.account_id,
+                                                     self.get_target_account_id(),
                                                      RuntimeConfig.get_share_with_accounts(self),
                                                      bucket.name)
                                                  )
@@ -455,9 +632,12 @@ class ShelveryEngine:
         self.do_wait_backup_available(backup_region=backup_region, backup_id=backup_id, timeout_fn=timeout_fn)
         return not (has_timed_out['value'] and RuntimeConfig.is_lambda_runtime(self))
 
-    def copy_backup(self, backup_resource: BackupResource, target_regions: List[str]):
+    def copy_backup(self, backup_resource: BackupResource, target_regions: List[str], priority: int = 0,
+                    retries: int = 0):
         """Copy backup to set of regions - this is orchestration method, rather than
-            logic implementation"""
+            logic implementation. Copies with lower priority value are started first
+            when number of copies to region is limited. Retries counts copies already
+            rejected due to that limit"""
         method = 'do_copy_backup'
 
         # call lambda recursively for each backup / region pair
@@ -465,13 +645,15 @@ class ShelveryEngine:
             arguments = {
                 'OriginRegion': backup_resource.region,
                 'BackupId': backup_resource.backup_id,
-                'Region': region
+                'Region': region,
+                'Priority': priority,
+                'CopyRetries': retries
             }
             ShelveryInvoker().invoke_shelvery_operation(self, method, arguments)
 
-    def share_backup(self, backup_resource: BackupResource, aws_account_id: str):
+    def share_backup(self, backup_resource: BackupResource, aws_account_ids: List[str]):
         """
-        Share backup with other AWS account - this is orchestration method, rather than
+        Share backup with other AWS accounts - this is orchestration method, rather than
         logic implementation, invokes actual implementation or lambda
         """
 
@@ -479,7 +661,7 @@ class ShelveryEngine:
         arguments = {
             'Region': backup_resource.region,
             'BackupId': backup_resource.backup_id,
-            'AwsAccountId': aws_account_id
+            'AwsAccountIds': list(aws_account_ids)
         }
         ShelveryInvoker().invoke_shelvery_operation(self, method, arguments)
 
@@ -489,14 +671,17 @@ class ShelveryEngine:
         """
 
         kwargs.update(map_args)
+        self.refresh_config()
         backup_id = kwargs['BackupId']
         origin_region = kwargs['OriginRegion']
-        backup_resource = self.get_backup_resource(origin_region, backup_id)
+        backup_resource = self.get_cached_backup_resource(origin_region, backup_id)
         # if backup is not available, exit and rely on recursive lambda call copy backup
         # in non lambda mode this should never happen
         if RuntimeConfig.is_offload_queueing(self):
             if not self.is_backup_available(origin_region,backup_id):
-                self.copy_backup(self.get_backup_resource(backup_resource, RuntimeConfig.get_dr_regions(backup_resource.entity_resource.tags, self)))
+                self.copy_backup(backup_resource, [kwargs['Region']], kwargs.get('Priority', 0),
+                                 kwargs.get('CopyRetries', 0))
+                return
         else:
             if not self.wait_backup_available(backup_region=origin_region,
                                               backup_id=backup_id,
@@ -506,19 +691,26 @@ class ShelveryEngine:
 
         self.logger.info(f"Do copy backup {kwargs['BackupId']} ({kwargs['OriginRegion']}) to region {kwargs['Region']}")
 
+        # copies in progress are limited per destination region. Within single process
+        # copies are queued until earlier copies complete, lambda invocations rely on
+        # retrying copies rejected by AWS
+        src_region = kwargs['OriginRegion']
+        dst_region = kwargs['Region']
+        priority = kwargs.get('Priority', 0)
+        retries = kwargs.get('CopyRetries', 0)
+        schedule_copy = not RuntimeConfig.is_lambda_runtime(self)
+        if schedule_copy:
+            self.copy_scheduler.acquire(dst_region, RuntimeConfig.get_copy_concurrency_per_region(self), priority)
+            self.logger.info(f"Started copy to {dst_region}, copy queue metrics: {self.copy_scheduler.metrics()}")
+
         # copy backup
+        regional_backup_id = None
         try:
-            src_region = kwargs['OriginRegion']
-            dst_region = kwargs['Region']
-            regional_backup_id = self.copy_backup_to_region(kwargs['BackupId'], dst_region)
-
-            # create tags on backup copy
+            # tags of backup copy are created along with the copy
             original_backup_id = kwargs['BackupId']
-            original_backup = self.get_backup_resource(src_region, original_backup_id)
             resource_copy = BackupResource(None, None, True)
-            resource_copy.backup_id = regional_backup_id
             resource_copy.region = kwargs['Region']
-            resource_copy.tags = original_backup.tags.copy()
+            resource_copy.tags = backup_resource.tags.copy()
 
             # add metadata to dr copy and original
             dr_copies_tag_key = f"{RuntimeConfig.get_tag_prefix()}:dr_copies"
@@ -527,13 +719,21 @@ class ShelveryEngine:
             resource_copy.tags[
                 f"{RuntimeConfig.get_tag_prefix()}:dr_source_backup"] = f"{src_region}:{original_backup_id}"
 
+            regional_backup_id = self.copy_backup_to_region(kwargs['BackupId'], dst_region, resource_copy.tags)
+            resource_copy.backup_id = regional_backup_id
+            resource_copy.mark_tags_persisted()
+
+            # dr_copies tag is read and written back, so original is described afresh rather than
+            # taken from describe cache, which may hold tags preceding copies made by other invocations
+            original_backup = self.get_backup_resource(src_region, original_backup_id)
             if dr_copies_tag_key not in original_backup.tags:
                 original_backup.tags[dr_copies_tag_key] = ''
             original_backup.tags[dr_copies_tag_key] = original_backup.tags[
                                                           dr_copies_tag_key] + f"{dst_region}:{regional_backup_id} "
 
-            self.tag_backup_resource(resource_copy)
+            # only dr_copies tag has changed on original backup
             self.tag_backup_resource(original_backup)
+            self.cache_backup_resource(original_backup)
             self.snspublisher.notify({
                 'Operation': 'CopyBackupToRegion',
                 'Status': 'OK',
@@ -542,56 +742,99 @@ class ShelveryEngine:
                 'BackupId': kwargs['BackupId'],
             })
             self.store_backup_data(resource_copy)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceLimitExceeded' and retries < self.COPY_MAX_RETRIES:
+                # too many copies in progress to destination region, retry ahead of new copies
+                self.logger.warning(f"Copy of backup {backup_id} to {dst_region} rejected due to copy limit, "
+                                    f"retrying in {self.COPY_RETRY_SECONDS} seconds "
+                                    f"(retry {retries + 1} of {self.COPY_MAX_RETRIES})")
+                if schedule_copy:
+                    self.copy_scheduler.release(dst_region)
+                    schedule_copy = False
+                if not RuntimeConfig.is_offload_queueing(self):
+                    time.sleep(self.COPY_RETRY_SECONDS)
+                self.copy_backup(backup_resource, [dst_region], priority - 1, retries + 1)
+                return
+            self._notify_copy_error(e, kwargs)
         except Exception as e:
-            self.snspublisher_error.notify({
-                'Operation': 'CopyBackupToRegion',
-                'Status': 'ERROR',
-                'ExceptionInfo': e.__dict__,
-                'DestinationRegion': kwargs['Region'],
-                'BackupType': self.get_engine_type(),
-                'BackupId': kwargs['BackupId'],
-            })
-            self.logger.exception(f"Error copying backup {kwargs['BackupId']} to {dst_region}")
+            self._notify_copy_error(e, kwargs)
+        finally:
+            if schedule_copy:
+                # copy counts against region limit until it completes
+                self._wait_regional_copy(dst_region, regional_backup_id)
+                self.copy_scheduler.release(dst_region)
+
+        if regional_backup_id is None:
+            return
 
         # shared backup copy with same accounts
-        for shared_account_id in RuntimeConfig.get_share_with_accounts(self):
+        shared_account_ids = RuntimeConfig.get_share_with_accounts(self)
+        if len(shared_account_ids) > 0:
             backup_resource = BackupResource(None, None, True)
             backup_resource.backup_id = regional_backup_id
             backup_resource.region = kwargs['Region']
             try:
-                self.share_backup(backup_resource, shared_account_id)
-                self.snspublisher.notify({
-                    'Operation': 'ShareRegionalBackupCopy',
-                    'Status': 'OK',
-                    'DestinationAccount': shared_account_id,
-                    'DestinationRegion': kwargs['Region'],
-                    'BackupType': self.get_engine_type(),
-                    'BackupId': kwargs['BackupId'],
-                })
+                self.share_backup(backup_resource, shared_account_ids)
+                for shared_account_id in shared_account_ids:
+                    self.snspublisher.notify({
+                        'Operation': 'ShareRegionalBackupCopy',
+                        'Status': 'OK',
+                        'DestinationAccount': shared_account_id,
+                        'DestinationRegion': kwargs['Region'],
+                        'BackupType': self.get_engine_type(),
+                        'BackupId': kwargs['BackupId'],
+                    })
             except Exception as e:
-                self.snspublisher_error.notify({
-                    'Operation': 'ShareRegionalBackupCopy',
-                    'Status': 'ERROR',
-                    'DestinationAccount': shared_account_id,
-                    'DestinationRegion': kwargs['Region'],
-                    'ExceptionInfo': e.__dict__,
-                    'BackupType': self.get_engine_type(),
-                    'BackupId': kwargs['BackupId'],
-                })
+                for shared_account_id in shared_account_ids:
+                    self.snspublisher_error.notify({
+                        'Operation': 'ShareRegionalBackupCopy',
+                        'Status': 'ERROR',
+                        'DestinationAccount': shared_account_id,
+                        'DestinationRegion': kwargs['Region'],
+                        'ExceptionInfo': e.__dict__,
+                        'BackupType': self.get_engine_type(),
+                        'BackupId': kwargs['BackupId'],
+                    })
                 self.logger.exception(f"Error sharing copied backup {kwargs['BackupId']} to {dst_region}")
 
+    def _notify_copy_error(self, e: Exception, kwargs: Dict):
+        self.snspublisher_error.notify({
+            'Operation': 'CopyBackupToRegion',
+            'Status': 'ERROR',
+            'ExceptionInfo': e.__dict__,
+            'DestinationRegion': kwargs['Region'],
+            'BackupType': self.get_engine_type(),
+            'BackupId': kwargs['BackupId'],
+        })
+        self.logger.exception(f"Error copying backup {kwargs['BackupId']} to {kwargs['Region']}")
+
+    def _wait_regional_copy(self, region: str, backup_id: str):
+        """Wait for backup copy to complete, releasing its copy slot regardless of outcome"""
+        if backup_id is None:
+            return
+        try:
+            self.do_wait_backup_available(backup_region=region, backup_id=backup_id, timeout_fn=lambda: None)
+        except Exception:
+            self.logger.exception(f"Failed waiting for backup copy {backup_id} in {region} to complete")
+
     def do_share_backup(self, map_args={}, **kwargs):
-        """Share backup with other AWS account, actual implementation"""
+        """Share backup with other AWS accounts, actual implementation"""
         kwargs.update(map_args)
+        self.refresh_config()
         backup_id = kwargs['BackupId']
         backup_region = kwargs['Region']
-        destination_account_id = kwargs['AwsAccountId']
-        backup_resource = self.get_backup_resource(backup_region, backup_id)
+        # payloads queued by previous versions carry single account
+        if 'AwsAccountIds' in kwargs:
+            destination_account_ids = kwargs['AwsAccountIds']
+        else:
+            destination_account_ids = [kwargs['AwsAccountId']]
+        backup_resource = self.get_cached_backup_resource(backup_region, backup_id)
         # if backup is not available, exit and rely on recursive lambda call do share backup
         # in non lambda mode this should never happen
         if RuntimeConfig.is_offload_queueing(self):
             if not self.is_backup_available(backup_region, backup_id):
-                self.share_backup(backup_resource, destination_account_id)
+                self.share_backup(backup_resource, destination_account_ids)
+                return
         else:
             if not self.wait_backup_available(backup_region=backup_region,
                                               backup_id=backup_id,
@@ -599,38 +842,40 @@ class ShelveryEngine:
                                               lambda_args=kwargs):
                 return
 
-        self.logger.info(f"Do share backup {backup_id} ({backup_region}) with {destination_account_id}")
+        self.logger.info(f"Do share backup {backup_id} ({backup_region}) with {', '.join(destination_account_ids)}")
         try:
-            self.share_backup_with_account(backup_region, backup_id, destination_account_id)
-            backup_resource = self.get_backup_resource(backup_region, backup_id)
-            self._write_backup_data(
-                backup_resource,
-                self._get_data_bucket(backup_region),
-                destination_account_id
-            )
-            self.snspublisher.notify({
-                'Operation': 'ShareBackup',
-                'Status': 'OK',
-                'BackupType': self.get_engine_type(),
-                'BackupName': backup_resource.name,
-                'DestinationAccount': kwargs['AwsAccountId']
-            })
+            self.share_backup_with_accounts(backup_region, backup_id, destination_account_ids)
+            backup_resource = self.get_cached_backup_resource(backup_region, backup_id)
+            for destination_account_id in destination_account_ids:
+                self._write_backup_data(
+                    backup_resource,
+                    self._get_data_bucket(backup_region),
+                    destination_account_id
+                )
+                self.snspublisher.notify({
+                    'Operation': 'ShareBackup',
+                    'Status': 'OK',
+                    'BackupType': self.get_engine_type(),
+                    'BackupName': backup_resource.name,
+                    'DestinationAccount': destination_account_id
+                })
         except ClientError as e:
             if e.response['Error']['Code'] == 'InvalidDBSnapshotState':
                 # This will occasionally happen due to AWS eventual consistency model
-                self.logger.warn(f"Retrying to share backup {backup_id} ({backup_region}) with account {destination_account_id} due to exception InvalidDBSnapshotState")
-                self.share_backup(backup_resource, destination_account_id)
+                self.logger.warn(f"Retrying to share backup {backup_id} ({backup_region}) with accounts {', '.join(destination_account_ids)} due to exception InvalidDBSnapshotState")
+                self.share_backup(backup_resource, destination_account_ids)
             else:
-                self.snspublisher_error.notify({
-                    'Operation': 'ShareBackup',
-                    'Status': 'ERROR',
-                    'ExceptionInfo': e.__dict__,
-                    'BackupType': self.get_engine_type(),
-                    'BackupId': backup_id,
-                    'DestinationAccount': kwargs['AwsAccountId']
-                })
+                for destination_account_id in destination_account_ids:
+                    self.snspublisher_error.notify({
+                        'Operation': 'ShareBackup',
+                        'Status': 'ERROR',
+                        'ExceptionInfo': e.__dict__,
+                        'BackupType': self.get_engine_type(),
+                        'BackupId': backup_id,
+                        'DestinationAccount': destination_account_id
+                    })
                 self.logger.exception(
-                    f"Failed to share backup {backup_id} ({backup_region}) with account {destination_account_id}")
+                    f"Failed to share backup {backup_id} ({backup_region}) with accounts {', '.join(destination_account_ids)}")
 
     def store_backup_data(self, backup_resource: BackupResource):
         """
@@ -657,14 +902,16 @@ class ShelveryEngine:
         :return:
         """
         kwargs.update(map_args)
+        self.refresh_config()
         backup_id = kwargs['BackupId']
         backup_region = kwargs['BackupRegion']
-        backup_resource = self.get_backup_resource(backup_region, backup_id)
+        backup_resource = self.get_cached_backup_resource(backup_region, backup_id)
         # if backup is not available, exit and rely on recursive lambda call write metadata
         # in non lambda mode this should never happen
         if RuntimeConfig.is_offload_queueing(self):
             if not self.is_backup_available(backup_region, backup_id):
                 self.store_backup_data(backup_resource)
+                return
         else:
             if not self.wait_backup_available(backup_region=backup_region,
                                               backup_id=backup_id,
@@ -673,7 +920,7 @@ class ShelveryEngine:
                 return
 
         if backup_resource.account_id is None:
-            backup_resource.account_id = self.account_id
+            backup_resource.account_id = self.get_target_account_id()
         bucket = self._get_data_bucket(backup_resource.region)
         self._write_backup_data(backup_resource, bucket)
 
@@ -682,12 +929,13 @@ class ShelveryEngine:
     ####
 
     @abstractmethod
-    def copy_shared_backup(self, source_account: str, source_backup: BackupResource) -> str:
+    def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None) -> str:
         """
         Copy Shelvery backup that has been shared from another account to account where
         shelvery is currently running
         :param source_account:
         :param source_backup:
+        :param tags: tags to create backup copy with
         :return:
         """
 
@@ -710,35 +958,46 @@ class ShelveryEngine:
         """
 
     @abstractmethod
-    def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
+    def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
         """
-        Collect existing backups on system of given type, marked with given tag
+        Collect existing backups on system of given type, marked with given tag.
+        Backups are generated lazily, page by page, so they are not all held in memory.
+        If entity ids are given, only backups of those entities are listed
         """
 
     @abstractmethod
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
         """
-        Returns list of objects with 'date_created', 'id' and 'tags' properties
+        Returns list of objects with 'date_created', 'id' and 'tags' properties.
+        If entity ids are given, only those entities are queried
         """
         return []
 
     @abstractmethod
     def backup_resource(self, backup_resource: BackupResource):
         """
-        Returns list of objects with 'date_created', 'id' and 'tags' properties
+        Create backup of entity, tagged with backup resource tags
         """
         return
 
     @abstractmethod
     def tag_backup_resource(self, backup_resource: BackupResource):
         """
-        Create backup resource tags
+        Create or update backup resource tags changed since they were last persisted
         """
 
+    def tag_backup_resources(self, backup_resources: List[BackupResource]):
+        """
+        Create or update tags of multiple backups. Engines may override this
+        to tag many backups within single API call
+        """
+        for backup_resource in backup_resources:
+            self.tag_backup_resource(backup_resource)
+
     @abstractmethod
-    def copy_backup_to_region(self, backup_id: str, region: str) -> str:
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
         """
-        Copy backup to another region
+        Copy backup to another region, creating copy with given tags
         """
 
     @abstractmethod
@@ -754,6 +1013,14 @@ class ShelveryEngine:
         Share backup with another AWS Account
         """
 
+    def share_backup_with_accounts(self, backup_region: str, backup_id: str, aws_account_ids: List[str]):
+        """
+        Share backup with multiple AWS Accounts. Engines whose APIs accept list of
+        accounts should override this to share backup within single call
+        """
+        for aws_account_id in aws_account_ids:
+            self.share_backup_with_account(backup_region, backup_id, aws_account_id)
+
     @abstractmethod
     def get_backup_resource(self, backup_region: str, backup_id: str) -> BackupResource:
         """
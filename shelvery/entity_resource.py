@@ -1,19 +1,30 @@
 from datetime import datetime
 from typing import Dict
-import boto3
+
+from shelvery.aws_helper import AwsHelper
 
 
 class EntityResource:
     """Represents entity such as ec2 volume, instance or rds instance"""
-    
+
+    __slots__ = ('resource_id', 'date_created', 'tags', 'resource_region')
+
     def __init__(self, resource_id: str, resource_region: str, date_created: datetime, tags: Dict):
         self.resource_id = resource_id
         self.date_created = date_created
         self.tags = tags
         self.resource_region = resource_region
     
+    def __getstate__(self):
+        # same format as attributes of earlier versions, for backup metadata stored in s3
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot in self.__slots__:
+            setattr(self, slot, state.get(slot))
+
     @classmethod
-    def empty(cls):
-        local_region = boto3.session.Session().region_name
+    def empty(cls, region=None):
+        local_region = region if region is not None else AwsHelper.local_region()
         resource = EntityResource(None, local_region, None, {})
         return resource
@@ -1,25 +1,34 @@
-from shelvery.ebs_backup import ShelveryEBSBackup
-from shelvery.engine import ShelveryEngine
-from shelvery.rds_backup import  ShelveryRDSBackup
-from shelvery.rds_cluster_backup import ShelveryRDSClusterBackup
-from shelvery.ec2ami_backup import ShelveryEC2AMIBackup
-from shelvery.redshift_backup import ShelveryRedshiftBackup
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-class ShelveryFactory:
+if TYPE_CHECKING:
+    from shelvery.engine import ShelveryEngine
 
-    @classmethod
-    def get_shelvery_instance(cls, type: str) -> ShelveryEngine:
-        if type == 'ebs':
-            return ShelveryEBSBackup()
 
-        if type == 'rds':
-            return ShelveryRDSBackup()
+class ShelveryFactory:
+
+    # backup types run by 'all'
+    ENGINE_TYPES = ['ebs', 'rds', 'rds_cluster', 'ec2ami', 'redshift']
 
-        if type == 'rds_cluster':
-            return ShelveryRDSClusterBackup()
+    # backup type -> module and class of engine. Only module of requested engine is imported,
+    # keeping cold start of lambda functions down to engine they run
+    ENGINE_CLASSES = {
+        'ebs': ('shelvery.ebs_backup', 'ShelveryEBSBackup'),
+        'rds': ('shelvery.rds_backup', 'ShelveryRDSBackup'),
+        'rds_cluster': ('shelvery.rds_cluster_backup', 'ShelveryRDSClusterBackup'),
+        'ec2ami': ('shelvery.ec2ami_backup', 'ShelveryEC2AMIBackup'),
+        'redshift': ('shelvery.redshift_backup', 'ShelveryRedshiftBackup')
+    }
 
-        if type == 'ec2ami':
-            return ShelveryEC2AMIBackup()
+    @classmethod
+    def get_engine_class(cls, type: str):
+        if type not in cls.ENGINE_CLASSES:
+            return None
+        module_name, class_name = cls.ENGINE_CLASSES[type]
+        return getattr(import_module(module_name), class_name)
 
-        if type == 'redshift':
-            return ShelveryRedshiftBackup()
+    @classmethod
+    def get_shelvery_instance(cls, type: str, region: str = None) -> 'ShelveryEngine':
+        engine_class = cls.get_engine_class(type)
+        if engine_class is not None:
+            return engine_class(region)
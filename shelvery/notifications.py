@@ -1,4 +1,3 @@
-import boto3
 import json
 import logging
 from shelvery.aws_helper import AwsHelper
@@ -12,7 +11,14 @@ class ShelveryNotification:
     def __init__(self, topic_arn):
         self.topic_arn = topic_arn
         logger.info("Initialized notification service")
-        self.sns = AwsHelper.boto3_client('sns')
+        self._sns = None
+
+    @property
+    def sns(self):
+        # client is created on first notification, so engines not notifying do not create it
+        if self._sns is None:
+            self._sns = AwsHelper.boto3_client('sns')
+        return self._sns
     
     def notify(self, message):
         if isinstance(message, dict):
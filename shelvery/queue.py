@@ -1,4 +1,3 @@
-import boto3
 import json
 import logging
 from shelvery.aws_helper import AwsHelper
@@ -14,7 +13,13 @@ class ShelveryQueue:
         # Max wait time is 900, if is set to greater, set value to 900
         self.wait_period = int(wait_period) if int(wait_period) < 900 else 900
         logger.info(f"Initialized sqs service with message delay of {self.wait_period} seconds")
-        self.sqs = AwsHelper.boto3_client('sqs')
+        self._sqs = None
+
+    @property
+    def sqs(self):
+        if self._sqs is None:
+            self._sqs = AwsHelper.boto3_client('sqs')
+        return self._sqs
 
     def send(self, message):
         if isinstance(message, dict):
@@ -5,11 +5,18 @@ from shelvery.backup_resource import BackupResource
 from shelvery.engine import ShelveryEngine, SHELVERY_DO_BACKUP_TAGS
 from shelvery.entity_resource import EntityResource
 
-from typing import Dict, List
+from typing import Dict, Iterator, List
 from botocore.errorfactory import ClientError
 from shelvery.aws_helper import AwsHelper
 
 class ShelveryRDSBackup(ShelveryEngine):
+    def __init__(self, region=None):
+        ShelveryEngine.__init__(self, region)
+        # snapshot arn -> tags, for snapshots not carrying TagList in describe response
+        self._rds_tags_cache = {}
+        # instance id -> latest automated snapshot, populated on first use within run
+        self._latest_automated_snapshots = None
+
     def is_backup_available(self, backup_region: str, backup_id: str) -> bool:
         rds_client = AwsHelper.boto3_client('rds', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         snapshots = rds_client.describe_db_snapshots(DBSnapshotIdentifier=backup_id)
@@ -30,85 +37,121 @@ class ShelveryRDSBackup(ShelveryEngine):
                         f"modes supported - set rds backup mode using rds_backup_mode configuration option ")
 
     def backup_from_latest_automated(self, backup_resource: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        auto_snapshots = rds_client.describe_db_snapshots(
-            DBInstanceIdentifier=backup_resource.entity_id,
-            SnapshotType='automated',
-            # API always returns in date descending order, and we only need last one
-            MaxRecords=20
-        )
-        auto_snapshots = sorted(auto_snapshots['DBSnapshots'], key=lambda k: k['SnapshotCreateTime'], reverse=True)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        latest_snapshots = self.get_latest_automated_snapshots(rds_client)
 
-        if len(auto_snapshots) == 0:
-            self.logger.info(f"There is no latest automated backup for cluster {backup_resource.entity_id},"
-                              f" fallback to RDS_CREATE_SNAPSHOT mode. Creating snapshot directly on cluster...")
+        if backup_resource.entity_id not in latest_snapshots:
+            self.logger.info(f"There is no latest automated backup for instance {backup_resource.entity_id},"
+                              f" fallback to RDS_CREATE_SNAPSHOT mode. Creating snapshot directly on instance...")
             return self.backup_from_instance(backup_resource)
 
-        automated_snapshot_id = auto_snapshots[0]['DBSnapshotIdentifier']
+        automated_snapshot_id = latest_snapshots[backup_resource.entity_id]['DBSnapshotIdentifier']
         rds_client.copy_db_snapshot(
             SourceDBSnapshotIdentifier=automated_snapshot_id,
             TargetDBSnapshotIdentifier=backup_resource.name,
-            CopyTags=False
+            CopyTags=False,
+            Tags=AwsHelper.rds_boto3_tags(backup_resource.tags)
         )
         backup_resource.backup_id = backup_resource.name
         return backup_resource
 
+    def get_latest_automated_snapshots(self, rds_client):
+        """
+        Index of latest automated snapshot per instance id. Built once per run, out of
+        single paginated listing of all automated snapshots within region
+        :param rds_client: boto3 rds client
+        :return: dictionary instance id -> latest automated snapshot
+        """
+        if self._latest_automated_snapshots is not None:
+            return self._latest_automated_snapshots
+
+        latest_snapshots = {}
+
+        def index_snapshots(snapshots):
+            for snap in snapshots:
+                # snapshots still being created have no create time yet
+                if 'SnapshotCreateTime' not in snap:
+                    continue
+                instance_id = snap['DBInstanceIdentifier']
+                if instance_id not in latest_snapshots or \
+                        latest_snapshots[instance_id]['SnapshotCreateTime'] < snap['SnapshotCreateTime']:
+                    latest_snapshots[instance_id] = snap
+
+        tmp_snapshots = rds_client.describe_db_snapshots(SnapshotType='automated')
+        index_snapshots(tmp_snapshots['DBSnapshots'])
+        while 'Marker' in tmp_snapshots:
+            tmp_snapshots = rds_client.describe_db_snapshots(SnapshotType='automated', Marker=tmp_snapshots['Marker'])
+            index_snapshots(tmp_snapshots['DBSnapshots'])
+
+        self.logger.info(f"Collected latest automated snapshots for {len(latest_snapshots)} RDS instances")
+        self._latest_automated_snapshots = latest_snapshots
+        return latest_snapshots
+
     def backup_from_instance(self, backup_resource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         rds_client.create_db_snapshot(
             DBSnapshotIdentifier=backup_resource.name,
-            DBInstanceIdentifier=backup_resource.entity_id
+            DBInstanceIdentifier=backup_resource.entity_id,
+            Tags=AwsHelper.rds_boto3_tags(backup_resource.tags)
         )
         backup_resource.backup_id = backup_resource.name
         return backup_resource
 
     def delete_backup(self, backup_resource: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn)
         rds_client.delete_db_snapshot(
             DBSnapshotIdentifier=backup_resource.backup_id
         )
 
     def tag_backup_resource(self, backup_resource: BackupResource):
+        changed_tags = backup_resource.changed_tags
+        if len(changed_tags) == 0:
+            return
         regional_rds_client = AwsHelper.boto3_client('rds', region_name=backup_resource.region, arn=self.role_arn, external_id=self.role_external_id)
-        snapshots = regional_rds_client.describe_db_snapshots(DBSnapshotIdentifier=backup_resource.backup_id)
-        snapshot_arn = snapshots['DBSnapshots'][0]['DBSnapshotArn']
+        snapshot_arn = self.get_snapshot_arn(backup_resource.region, backup_resource.backup_id)
         regional_rds_client.add_tags_to_resource(
             ResourceName=snapshot_arn,
-            Tags=list(
-                map(lambda k: {'Key': k, 'Value': backup_resource.tags[k].replace(',', ' ')}, backup_resource.tags))
+            Tags=AwsHelper.rds_boto3_tags(changed_tags)
         )
+        backup_resource.mark_tags_persisted()
 
-    def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-
-        # collect all snapshots
-        all_snapshots = self.collect_all_snapshots(rds_client)
+    def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
 
-        # filter ones backed up with shelvery
-        all_backups = self.get_shelvery_backups_only(all_snapshots, backup_tag_prefix, rds_client)
+        # instances are listed once, and joined with snapshots one page at a time
+        instances = None
+        entities = {}
+        for snapshots in self.collect_snapshot_pages(rds_client, entity_ids):
+            if len(snapshots) == 0:
+                continue
+            if instances is None:
+                instances = dict((instance['DBInstanceIdentifier'], instance) for instance in self.get_all_instances(rds_client, entity_ids))
+            self.populate_snap_entity_resource(snapshots, instances, entities)
 
-        return all_backups
+            # filter ones backed up with shelvery
+            yield from self.get_shelvery_backups_only(snapshots, backup_tag_prefix, rds_client)
 
     def share_backup_with_account(self, backup_region: str, backup_id: str, aws_account_id: str):
+        self.share_backup_with_accounts(backup_region, backup_id, [aws_account_id])
+
+    def share_backup_with_accounts(self, backup_region: str, backup_id: str, aws_account_ids: List[str]):
         rds_client = AwsHelper.boto3_client('rds', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         rds_client.modify_db_snapshot_attribute(
             DBSnapshotIdentifier=backup_id,
             AttributeName='restore',
-            ValuesToAdd=[aws_account_id]
+            ValuesToAdd=list(aws_account_ids)
         )
 
-    def copy_backup_to_region(self, backup_id: str, region: str) -> str:
-        local_region = boto3.session.Session().region_name
-        client_local = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
+        local_region = self.region
         rds_client = AwsHelper.boto3_client('rds', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
-        snapshots = client_local.describe_db_snapshots(DBSnapshotIdentifier=backup_id)
-        snapshot = snapshots['DBSnapshots'][0]
         rds_client.copy_db_snapshot(
-            SourceDBSnapshotIdentifier=snapshot['DBSnapshotArn'],
+            SourceDBSnapshotIdentifier=self.get_snapshot_arn(local_region, backup_id),
             TargetDBSnapshotIdentifier=backup_id,
             SourceRegion=local_region,
             # tags are created explicitly
-            CopyTags=False
+            CopyTags=False,
+            Tags=AwsHelper.rds_boto3_tags(tags or {})
         )
         return backup_id
 
@@ -118,33 +161,42 @@ class ShelveryRDSBackup(ShelveryEngine):
         snapshot = snapshots['DBSnapshots'][0]
         tags = rds_client.list_tags_for_resource(ResourceName=snapshot['DBSnapshotArn'])['TagList']
         d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
-        return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags)
+        return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags, self.get_target_account_id())
 
     def get_engine_type(self) -> str:
         return 'rds'
 
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+    def get_snapshot_arn(self, region: str, snapshot_id: str) -> str:
+        """Snapshot ARN is derived from region, account and identifier, no need to describe snapshot"""
+        return f"arn:aws:rds:{region}:{self.get_target_account_id()}:snapshot:{snapshot_id}"
+
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
         # region and api client
-        local_region = boto3.session.Session().region_name
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+        local_region = self.region
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
 
         # list of models returned from api
         db_entities = []
 
-        db_instances = self.get_all_instances(rds_client)
-
-        # collect tags in check if instance tagged with marker tag
-
-        for instance in db_instances:
-            tags = rds_client.list_tags_for_resource(ResourceName=instance['DBInstanceArn'])['TagList']
-
-            # convert api response to dictionary
-            d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
-
+        # instances that are part of cluster are backed up by rds_cluster engine
+        db_instances = []
+        for instance in self.get_all_instances(rds_client, entity_ids):
             if 'DBClusterIdentifier' in instance:
                 self.logger.info(f"Skipping RDS Instance {instance['DBInstanceIdentifier']} as it is part"
                                  f" of cluster {instance['DBClusterIdentifier']}")
                 continue
+            db_instances.append(instance)
+
+        # describe_db_instances returns TagList, fallback to listing tags only for instances without it
+        untagged_arns = [instance['DBInstanceArn'] for instance in db_instances if 'TagList' not in instance]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
+
+        # check if instance tagged with marker tag
+        for instance in db_instances:
+            if 'TagList' in instance:
+                d_tags = BackupResource.dict_from_boto3_tags(instance['TagList'])
+            else:
+                d_tags = fetched_tags[instance['DBInstanceArn']]
 
             # check if marker tag is present
             if tag_name in d_tags and d_tags[tag_name] in SHELVERY_DO_BACKUP_TAGS:
@@ -156,20 +208,24 @@ class ShelveryRDSBackup(ShelveryEngine):
 
         return db_entities
 
-    def get_all_instances(self, rds_client):
+    def get_all_instances(self, rds_client, instance_ids: List[str] = None):
         """
         Get all RDS instances within region for given boto3 client
         :param rds_client: boto3 rds service
+        :param instance_ids: if given, only instances with these identifiers are described
         :return: all RDS instances within region for given boto3 client
         """
         # list of resource models
         db_instances = []
+        params = {}
+        if instance_ids is not None:
+            params['Filters'] = [{'Name': 'db-instance-id', 'Values': list(instance_ids)}]
         # temporary list of api models, as calls are batched
-        temp_instances = rds_client.describe_db_instances()
+        temp_instances = rds_client.describe_db_instances(**params)
         db_instances.extend(temp_instances['DBInstances'])
         # collect database instances
         while 'Marker' in temp_instances:
-            temp_instances = rds_client.describe_db_instances(Marker=temp_instances['Marker'])
+            temp_instances = rds_client.describe_db_instances(Marker=temp_instances['Marker'], **params)
             db_instances.extend(temp_instances['DBInstances'])
 
         return db_instances
@@ -179,78 +235,95 @@ class ShelveryRDSBackup(ShelveryEngine):
         :param all_snapshots: all snapshots within region
         :param backup_tag_prefix:  prefix of shelvery backup system
         :param rds_client:  amazon boto3 rds client
-        :return: snapshots created using shelvery
+        :return: generator of snapshots created using shelvery
         """
-        all_backups = []
         marker_tag = f"{backup_tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}"
+
+        # describe_db_snapshots returns TagList, fallback to listing tags only for snapshots without it
+        untagged_arns = [snap['DBSnapshotArn'] for snap in all_snapshots if 'TagList' not in snap]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
+
         for snap in all_snapshots:
-            tags = rds_client.list_tags_for_resource(ResourceName=snap['DBSnapshotArn'])['TagList']
-            self.logger.info(f"Checking RDS Snap {snap['DBSnapshotIdentifier']}")
-            d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
+            if 'TagList' in snap:
+                d_tags = BackupResource.dict_from_boto3_tags(snap['TagList'])
+            else:
+                d_tags = fetched_tags[snap['DBSnapshotArn']]
             if marker_tag in d_tags:
                 if d_tags[marker_tag] in SHELVERY_DO_BACKUP_TAGS:
-                    backup_resource = BackupResource.construct(backup_tag_prefix, snap['DBSnapshotIdentifier'], d_tags)
+                    backup_resource = BackupResource.construct(backup_tag_prefix, snap['DBSnapshotIdentifier'], d_tags,
+                                                               self.get_target_account_id())
                     backup_resource.entity_resource = snap['EntityResource']
                     backup_resource.entity_id = snap['EntityResource'].resource_id
+                    yield backup_resource
 
-                    all_backups.append(backup_resource)
-
-        return all_backups
-
-    def copy_shared_backup(self, source_account: str, source_backup: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        # copying of tags happens outside this method
+    def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None):
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         source_arn = f"arn:aws:rds:{source_backup.region}:{source_backup.account_id}:snapshot:{source_backup.backup_id}"
         snap = rds_client.copy_db_snapshot(
             SourceDBSnapshotIdentifier=source_arn,
             SourceRegion=source_backup.region,
             CopyTags=False,
+            Tags=AwsHelper.rds_boto3_tags(tags or {}),
             TargetDBSnapshotIdentifier=source_backup.backup_id
         )
         return snap['DBSnapshot']['DBSnapshotIdentifier']
 
-    def collect_all_snapshots(self, rds_client):
+    def collect_snapshot_pages(self, rds_client, instance_ids: List[str] = None):
         """
         :param rds_client:
-        :return: All snapshots within region for rds_client
+        :param instance_ids: if given, only snapshots of instances with these identifiers are listed
+        :return: generator of manual snapshot pages within region for rds_client
         """
-        all_snapshots = []
-        tmp_snapshots = rds_client.describe_db_snapshots(SnapshotType='manual')
-        all_snapshots.extend(tmp_snapshots['DBSnapshots'])
-        while 'Marker' in tmp_snapshots:
-            tmp_snapshots = rds_client.describe_db_snapshots(Marker=tmp_snapshots['Marker'])
-            all_snapshots.extend(tmp_snapshots['DBSnapshots'])
-
-        self.populate_snap_entity_resource(all_snapshots)
+        self.logger.info("Collecting DB snapshots...")
+        collected = 0
+        params = {'SnapshotType': 'manual'}
+        if instance_ids is not None:
+            params['Filters'] = [{'Name': 'db-instance-id', 'Values': list(instance_ids)}]
+        tmp_snapshots = rds_client.describe_db_snapshots(**params)
+        while True:
+            collected += len(tmp_snapshots['DBSnapshots'])
+            yield tmp_snapshots['DBSnapshots']
+            if 'Marker' not in tmp_snapshots:
+                break
+            self.logger.info(f"Collected {collected} manual snapshots. Continuing collection...")
+            tmp_snapshots = rds_client.describe_db_snapshots(Marker=tmp_snapshots['Marker'], **params)
+
+        self.logger.info(f"Collected {collected} manual snapshots.")
+
+    def populate_snap_entity_resource(self, all_snapshots, instances=None, entities=None):
+        """
+        :param all_snapshots: snapshots to populate 'EntityResource' of
+        :param instances: map instance id->instance of all instances within region, listed if not given
+        :param entities: map instance id->entity resource of instances already joined, updated in place
+        """
+        entities = {} if entities is None else entities
+        instance_ids = set(snap['DBInstanceIdentifier'] for snap in all_snapshots) - entities.keys()
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        local_region = self.region
 
-        return all_snapshots
+        # single paginated listing of all instances, hashed by instance id
+        if instances is None:
+            instances = dict((instance['DBInstanceIdentifier'], instance) for instance in self.get_all_instances(rds_client))
 
-    def populate_snap_entity_resource(self, all_snapshots):
-        instance_ids = []
-        for snap in all_snapshots:
-            if snap['DBInstanceIdentifier'] not in instance_ids:
-                instance_ids.append(snap['DBInstanceIdentifier'])
-        entities = {}
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        local_region = boto3.session.Session().region_name
+        untagged_arns = [instances[instance_id]['DBInstanceArn'] for instance_id in instance_ids
+                         if instance_id in instances and 'TagList' not in instances[instance_id]]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
 
         for instance_id in instance_ids:
-            try:
-                rds_instance = rds_client.describe_db_instances(DBInstanceIdentifier=instance_id)['DBInstances'][0]
-                tags = rds_client.list_tags_for_resource(ResourceName=rds_instance['DBInstanceArn'])['TagList']
-                d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
-                rds_entity = EntityResource(instance_id,
-                                            local_region,
-                                            rds_instance['InstanceCreateTime'],
-                                            d_tags)
-                entities[instance_id] = rds_entity
-            except ClientError as e:
-                if 'DBInstanceNotFoundFault' in str(type(e)):
-                    entities[instance_id] = EntityResource.empty()
-                    entities[instance_id].resource_id = instance_id
+            if instance_id in instances:
+                rds_instance = instances[instance_id]
+                if 'TagList' in rds_instance:
+                    d_tags = BackupResource.dict_from_boto3_tags(rds_instance['TagList'])
                 else:
-                    raise e
+                    d_tags = fetched_tags[rds_instance['DBInstanceArn']]
+                entities[instance_id] = EntityResource(instance_id,
+                                                       local_region,
+                                                       rds_instance['InstanceCreateTime'],
+                                                       d_tags)
+            else:
+                # instance has been deleted since snapshot was taken
+                entities[instance_id] = EntityResource.empty(self.region)
+                entities[instance_id].resource_id = instance_id
 
         for snap in all_snapshots:
-            if snap['DBInstanceIdentifier'] in entities:
-                snap['EntityResource'] = entities[snap['DBInstanceIdentifier']]
+            snap['EntityResource'] = entities[snap['DBInstanceIdentifier']]
@@ -5,11 +5,18 @@ from shelvery.backup_resource import BackupResource
 from shelvery.engine import ShelveryEngine, SHELVERY_DO_BACKUP_TAGS
 from shelvery.entity_resource import EntityResource
 
-from typing import Dict, List
+from typing import Dict, Iterator, List
 from botocore.errorfactory import ClientError
 from shelvery.aws_helper import AwsHelper
 
 class ShelveryRDSClusterBackup(ShelveryEngine):
+    def __init__(self, region=None):
+        ShelveryEngine.__init__(self, region)
+        # snapshot arn -> tags, for snapshots not carrying TagList in describe response
+        self._rds_tags_cache = {}
+        # cluster id -> latest automated snapshot, populated on first use within run
+        self._latest_automated_snapshots = None
+
     def is_backup_available(self, backup_region: str, backup_id: str) -> bool:
         rds_client = AwsHelper.boto3_client('rds', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         snapshots = rds_client.describe_db_cluster_snapshots(DBClusterSnapshotIdentifier=backup_id)
@@ -30,102 +37,136 @@ class ShelveryRDSClusterBackup(ShelveryEngine):
                         f"modes supported - set rds backup mode using rds_backup_mode configuration option ")
 
     def backup_from_latest_automated(self, backup_resource: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        auto_snapshots = rds_client.describe_db_cluster_snapshots(
-            DBClusterIdentifier=backup_resource.entity_id,
-            SnapshotType='automated',
-            # API always returns in date descending order, and we only need last one
-            MaxRecords=20
-        )
-        auto_snapshots = sorted(auto_snapshots['DBClusterSnapshots'], key=lambda k: k['SnapshotCreateTime'],
-                                reverse=True)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        latest_snapshots = self.get_latest_automated_snapshots(rds_client)
 
-        if len(auto_snapshots) == 0:
+        if backup_resource.entity_id not in latest_snapshots:
             self.logger.info(f"There is no latest automated backup for cluster {backup_resource.entity_id},"
                               f" fallback to RDS_CREATE_SNAPSHOT mode. Creating snapshot directly on cluster...")
             return self.backup_from_cluster(backup_resource)
 
-        # TODO handle case when there are no latest automated backups
-        automated_snapshot_id = auto_snapshots[0]['DBClusterSnapshotIdentifier']
+        automated_snapshot_id = latest_snapshots[backup_resource.entity_id]['DBClusterSnapshotIdentifier']
         response = rds_client.copy_db_cluster_snapshot(
             SourceDBClusterSnapshotIdentifier=automated_snapshot_id,
             TargetDBClusterSnapshotIdentifier=backup_resource.name,
-            CopyTags=False
+            CopyTags=False,
+            Tags=AwsHelper.rds_boto3_tags(backup_resource.tags)
         )
         backup_resource.resource_properties = response['DBClusterSnapshot']
         backup_resource.backup_id = backup_resource.name
         return backup_resource
 
+    def get_latest_automated_snapshots(self, rds_client):
+        """
+        Index of latest automated snapshot per cluster id. Built once per run, out of
+        single paginated listing of all automated cluster snapshots within region
+        :param rds_client: boto3 rds client
+        :return: dictionary cluster id -> latest automated cluster snapshot
+        """
+        if self._latest_automated_snapshots is not None:
+            return self._latest_automated_snapshots
+
+        latest_snapshots = {}
+
+        def index_snapshots(snapshots):
+            for snap in snapshots:
+                # snapshots still being created have no create time yet
+                if 'SnapshotCreateTime' not in snap:
+                    continue
+                cluster_id = snap['DBClusterIdentifier']
+                if cluster_id not in latest_snapshots or \
+                        latest_snapshots[cluster_id]['SnapshotCreateTime'] < snap['SnapshotCreateTime']:
+                    latest_snapshots[cluster_id] = snap
+
+        tmp_snapshots = rds_client.describe_db_cluster_snapshots(SnapshotType='automated')
+        index_snapshots(tmp_snapshots['DBClusterSnapshots'])
+        while 'Marker' in tmp_snapshots:
+            tmp_snapshots = rds_client.describe_db_cluster_snapshots(SnapshotType='automated',
+                                                                     Marker=tmp_snapshots['Marker'])
+            index_snapshots(tmp_snapshots['DBClusterSnapshots'])
+
+        self.logger.info(f"Collected latest automated snapshots for {len(latest_snapshots)} RDS clusters")
+        self._latest_automated_snapshots = latest_snapshots
+        return latest_snapshots
+
     def backup_from_cluster(self, backup_resource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         response = rds_client.create_db_cluster_snapshot(
             DBClusterSnapshotIdentifier=backup_resource.name,
-            DBClusterIdentifier=backup_resource.entity_id
+            DBClusterIdentifier=backup_resource.entity_id,
+            Tags=AwsHelper.rds_boto3_tags(backup_resource.tags)
         )
         backup_resource.resource_properties = response['DBClusterSnapshot']
         backup_resource.backup_id = backup_resource.name
         return backup_resource
 
     def delete_backup(self, backup_resource: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         rds_client.delete_db_cluster_snapshot(
             DBClusterSnapshotIdentifier=backup_resource.backup_id
         )
 
     def tag_backup_resource(self, backup_resource: BackupResource):
+        changed_tags = backup_resource.changed_tags
+        if len(changed_tags) == 0:
+            return
         regional_rds_client = AwsHelper.boto3_client('rds', region_name=backup_resource.region, arn=self.role_arn, external_id=self.role_external_id)
-        snapshots = regional_rds_client.describe_db_cluster_snapshots(
-            DBClusterSnapshotIdentifier=backup_resource.backup_id)
-        snapshot_arn = snapshots['DBClusterSnapshots'][0]['DBClusterSnapshotArn']
-        tags = list(map(lambda k: {'Key': k, 'Value': backup_resource.tags[k].replace(',', ' ')}, backup_resource.tags))
+        snapshot_arn = self.get_snapshot_arn(backup_resource.region, backup_resource.backup_id)
         regional_rds_client.add_tags_to_resource(
             ResourceName=snapshot_arn,
-            Tags=tags
+            Tags=AwsHelper.rds_boto3_tags(changed_tags)
         )
+        backup_resource.mark_tags_persisted()
 
-    def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-
-        # collect all snapshots
-        all_snapshots = self.collect_all_snapshots(rds_client)
+    def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
 
-        # filter ones backed up with shelvery
-        all_backups = self.get_shelvery_backups_only(all_snapshots, backup_tag_prefix, rds_client)
+        # clusters are listed once, and joined with snapshots one page at a time
+        clusters = None
+        entities = {}
+        for snapshots in self.collect_snapshot_pages(rds_client, entity_ids):
+            if len(snapshots) == 0:
+                continue
+            if clusters is None:
+                clusters = dict((cluster['DBClusterIdentifier'], cluster) for cluster in self.get_all_clusters(rds_client, entity_ids))
+            self.populate_snap_entity_resource(snapshots, clusters, entities)
 
-        return all_backups
+            # filter ones backed up with shelvery
+            yield from self.get_shelvery_backups_only(snapshots, backup_tag_prefix, rds_client)
 
     def share_backup_with_account(self, backup_region: str, backup_id: str, aws_account_id: str):
+        self.share_backup_with_accounts(backup_region, backup_id, [aws_account_id])
+
+    def share_backup_with_accounts(self, backup_region: str, backup_id: str, aws_account_ids: List[str]):
         rds_client = AwsHelper.boto3_client('rds', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
         rds_client.modify_db_cluster_snapshot_attribute(
             DBClusterSnapshotIdentifier=backup_id,
             AttributeName='restore',
-            ValuesToAdd=[aws_account_id]
+            ValuesToAdd=list(aws_account_ids)
         )
 
-    def copy_backup_to_region(self, backup_id: str, region: str) -> str:
-        local_region = boto3.session.Session().region_name
-        client_local = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        rds_client = AwsHelper.boto3_client('rds', region_name=region)
-        snapshots = client_local.describe_db_cluster_snapshots(DBClusterSnapshotIdentifier=backup_id)
-        snapshot = snapshots['DBClusterSnapshots'][0]
+    def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
+        local_region = self.region
+        rds_client = AwsHelper.boto3_client('rds', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
         rds_client.copy_db_cluster_snapshot(
-            SourceDBClusterSnapshotIdentifier=snapshot['DBClusterSnapshotArn'],
+            SourceDBClusterSnapshotIdentifier=self.get_snapshot_arn(local_region, backup_id),
             TargetDBClusterSnapshotIdentifier=backup_id,
             SourceRegion=local_region,
             # tags are created explicitly
-            CopyTags=False
+            CopyTags=False,
+            Tags=AwsHelper.rds_boto3_tags(tags or {})
         )
         return backup_id
 
-    def copy_shared_backup(self, source_account: str, source_backup: BackupResource):
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        # copying of tags happens outside this method
+    def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None):
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
         source_arn = f"arn:aws:rds:{source_backup.region}:{source_backup.account_id}:cluster-snapshot:{source_backup.backup_id}"
 
         params = {
             'SourceDBClusterSnapshotIdentifier': source_arn,
             'SourceRegion': source_backup.region,
             'CopyTags': False,
+            'Tags': AwsHelper.rds_boto3_tags(tags or {}),
             'TargetDBClusterSnapshotIdentifier': source_backup.backup_id
         }
 
@@ -144,55 +185,66 @@ class ShelveryRDSClusterBackup(ShelveryEngine):
         snapshot = snapshots['DBClusterSnapshots'][0]
         tags = rds_client.list_tags_for_resource(ResourceName=snapshot['DBClusterSnapshotArn'])['TagList']
         d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
-        resource = BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags)
+        resource = BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags, self.get_target_account_id())
         resource.resource_properties = snapshot
         return resource
 
     def get_engine_type(self) -> str:
         return 'rds_cluster'
 
-    def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+    def get_snapshot_arn(self, region: str, snapshot_id: str) -> str:
+        """Snapshot ARN is derived from region, account and identifier, no need to describe snapshot"""
+        return f"arn:aws:rds:{region}:{self.get_target_account_id()}:cluster-snapshot:{snapshot_id}"
+
+    def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
         # region and api client
-        local_region = boto3.session.Session().region_name
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
+        local_region = self.region
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
 
         # list of models returned from api
         db_cluster_entities = []
 
-        db_clusters = self.get_all_clusters(rds_client)
-
-        # collect tags in check if instance tagged with marker tag
+        db_clusters = self.get_all_clusters(rds_client, entity_ids)
 
-        for instance in db_clusters:
-            tags = rds_client.list_tags_for_resource(ResourceName=instance['DBClusterArn'])['TagList']
+        # describe_db_clusters returns TagList, fallback to listing tags only for clusters without it
+        untagged_arns = [cluster['DBClusterArn'] for cluster in db_clusters if 'TagList' not in cluster]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
 
-            # convert api response to dictionary
-            d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
+        # check if cluster tagged with marker tag
+        for cluster in db_clusters:
+            if 'TagList' in cluster:
+                d_tags = BackupResource.dict_from_boto3_tags(cluster['TagList'])
+            else:
+                d_tags = fetched_tags[cluster['DBClusterArn']]
 
             # check if marker tag is present
             if tag_name in d_tags and d_tags[tag_name] in SHELVERY_DO_BACKUP_TAGS:
-                resource = EntityResource(instance['DBClusterIdentifier'],
+                resource = EntityResource(cluster['DBClusterIdentifier'],
                                           local_region,
-                                          instance['ClusterCreateTime'],
+                                          cluster['ClusterCreateTime'],
                                           d_tags)
                 db_cluster_entities.append(resource)
 
         return db_cluster_entities
 
-    def get_all_clusters(self, rds_client):
+    def get_all_clusters(self, rds_client, cluster_ids: List[str] = None):
         """
         Get all RDS clusters within region for given boto3 client
         :param rds_client: boto3 rds service
+        :param cluster_ids: if given, only clusters with these identifiers are described
         :return: all RDS instances within region for given boto3 client
         """
         # list of resource models
         db_clusters = []
+        params = {}
+        if cluster_ids is not None:
+            params['Filters'] = [{'Name': 'db-cluster-id', 'Values': list(cluster_ids)}]
         # temporary list of api models, as calls are batched
-        temp_clusters = rds_client.describe_db_clusters()
+        temp_clusters = rds_client.describe_db_clusters(**params)
         db_clusters.extend(temp_clusters['DBClusters'])
         # collect database instances
         while 'Marker' in temp_clusters:
-            temp_clusters = rds_client.describe_db_clusters(Marker=temp_clusters['Marker'])
+            temp_clusters = rds_client.describe_db_clusters(Marker=temp_clusters['Marker'], **params)
             db_clusters.extend(temp_clusters['DBClusters'])
 
         return db_clusters
@@ -202,75 +254,83 @@ class ShelveryRDSClusterBackup(ShelveryEngine):
         :param all_snapshots: all snapshots within region
         :param backup_tag_prefix:  prefix of shelvery backup system
         :param rds_client:  amazon boto3 rds client
-        :return: snapshots created using shelvery
+        :return: generator of snapshots created using shelvery
         """
-        all_backups = []
         marker_tag = f"{backup_tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}"
+
+        # describe_db_cluster_snapshots returns TagList, fallback to listing tags only for snapshots without it
+        untagged_arns = [snap['DBClusterSnapshotArn'] for snap in all_snapshots if 'TagList' not in snap]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
+
         for snap in all_snapshots:
-            tags = rds_client.list_tags_for_resource(ResourceName=snap['DBClusterSnapshotArn'])['TagList']
-            self.logger.info(f"Checking RDS Snap {snap['DBClusterSnapshotIdentifier']}")
-            d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
+            if 'TagList' in snap:
+                d_tags = BackupResource.dict_from_boto3_tags(snap['TagList'])
+            else:
+                d_tags = fetched_tags[snap['DBClusterSnapshotArn']]
             if marker_tag in d_tags:
                 if d_tags[marker_tag] in SHELVERY_DO_BACKUP_TAGS:
                     backup_resource = BackupResource.construct(backup_tag_prefix, snap['DBClusterSnapshotIdentifier'],
-                                                               d_tags)
+                                                               d_tags, self.get_target_account_id())
                     backup_resource.entity_resource = snap['EntityResource']
                     backup_resource.entity_id = snap['EntityResource'].resource_id
+                    yield backup_resource
 
-                    all_backups.append(backup_resource)
-
-        return all_backups
-
-    def collect_all_snapshots(self, rds_client):
+    def collect_snapshot_pages(self, rds_client, cluster_ids: List[str] = None):
         """
         :param rds_client:
-        :return: All snapshots within region for rds_client
+        :param cluster_ids: if given, only snapshots of clusters with these identifiers are listed
+        :return: generator of manual snapshot pages within region for rds_client
         """
-        all_snapshots = []
-
         self.logger.info("Collecting DB cluster snapshots...")
-        tmp_snapshots = rds_client.describe_db_cluster_snapshots(SnapshotType='manual')
-        all_snapshots.extend(tmp_snapshots['DBClusterSnapshots'])
-
-        while 'Marker' in tmp_snapshots:
-            self.logger.info(f"Collected {len(tmp_snapshots['DBClusterSnapshots'])} manual snapshots. Continuing collection...")
-            tmp_snapshots = rds_client.describe_db_cluster_snapshots(SnapshotType='manual', Marker=tmp_snapshots['Marker'])
-            all_snapshots.extend(tmp_snapshots['DBClusterSnapshots'])
-
-        self.logger.info(f"Collected {len(all_snapshots)} manual snapshots.")
-        self.populate_snap_entity_resource(all_snapshots)
-
-        return all_snapshots
-
-    def populate_snap_entity_resource(self, all_snapshots):
-        cluster_ids = []
+        collected = 0
+        params = {'SnapshotType': 'manual'}
+        if cluster_ids is not None:
+            params['Filters'] = [{'Name': 'db-cluster-id', 'Values': list(cluster_ids)}]
+        tmp_snapshots = rds_client.describe_db_cluster_snapshots(**params)
+        while True:
+            collected += len(tmp_snapshots['DBClusterSnapshots'])
+            yield tmp_snapshots['DBClusterSnapshots']
+            if 'Marker' not in tmp_snapshots:
+                break
+            self.logger.info(f"Collected {collected} manual snapshots. Continuing collection...")
+            tmp_snapshots = rds_client.describe_db_cluster_snapshots(Marker=tmp_snapshots['Marker'], **params)
+
+        self.logger.info(f"Collected {collected} manual snapshots.")
+
+    def populate_snap_entity_resource(self, all_snapshots, clusters=None, entities=None):
+        """
+        :param all_snapshots: snapshots to populate 'EntityResource' of
+        :param clusters: map cluster id->cluster of all clusters within region, listed if not given
+        :param entities: map cluster id->entity resource of clusters already joined, updated in place
+        """
+        entities = {} if entities is None else entities
+        cluster_ids = set(snap['DBClusterIdentifier'] for snap in all_snapshots) - entities.keys()
+        rds_client = AwsHelper.boto3_client('rds', region_name=self.region, arn=self.role_arn, external_id=self.role_external_id)
+        local_region = self.region
 
-        for snap in all_snapshots:
-            if snap['DBClusterIdentifier'] not in cluster_ids:
-                cluster_ids.append(snap['DBClusterIdentifier'])
+        # single paginated listing of all clusters, hashed by cluster id
+        if clusters is None:
+            clusters = dict((cluster['DBClusterIdentifier'], cluster) for cluster in self.get_all_clusters(rds_client))
 
-        entities = {}
-        rds_client = AwsHelper.boto3_client('rds', arn=self.role_arn, external_id=self.role_external_id)
-        local_region = boto3.session.Session().region_name
+        untagged_arns = [clusters[cluster_id]['DBClusterArn'] for cluster_id in cluster_ids
+                         if cluster_id in clusters and 'TagList' not in clusters[cluster_id]]
+        fetched_tags = AwsHelper.rds_tags_by_arn(rds_client, untagged_arns, self._rds_tags_cache)
 
         for cluster_id in cluster_ids:
-            try:
-                self.logger.info(f"Collecting tags from DB cluster {cluster_id} ...")
-                rds_instance = rds_client.describe_db_clusters(DBClusterIdentifier=cluster_id)['DBClusters'][0]
-                tags = rds_client.list_tags_for_resource(ResourceName=rds_instance['DBClusterArn'])['TagList']
-                d_tags = dict(map(lambda t: (t['Key'], t['Value']), tags))
-                rds_entity = EntityResource(cluster_id,
-                                            local_region,
-                                            rds_instance['ClusterCreateTime'],
-                                            d_tags)
-                entities[cluster_id] = rds_entity
-            except ClientError as e:
-                if 'DBClusterNotFoundFault' in str(type(e)):
-                    entities[cluster_id] = EntityResource.empty()
-                    entities[cluster_id].resource_id = cluster_id
+            if cluster_id in clusters:
+                cluster = clusters[cluster_id]
+                if 'TagList' in cluster:
+                    d_tags = BackupResource.dict_from_boto3_tags(cluster['TagList'])
                 else:
-                    raise e
+                    d_tags = fetched_tags[cluster['DBClusterArn']]
+                entities[cluster_id] = EntityResource(cluster_id,
+                                                      local_region,
+                                                      cluster['ClusterCreateTime'],
+                                                      d_tags)
+            else:
+                # cluster has been deleted since snapshot was taken
+                entities[cluster_id] = EntityResource.empty(self.region)
+                entities[cluster_id].resource_id = cluster_id
 
         for snap in all_snapshots:
-            if snap['DBClusterIdentifier'] in entities:
-                snap['EntityResource'] = entities[snap['DBClusterIdentifier']]
+            snap['EntityResource'] = entities[snap['DBClusterIdentifier']]
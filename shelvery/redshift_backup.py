@@ -1,7 +1,7 @@
-import boto3, datetime
+import datetime
 from botocore.exceptions import ClientError
 
-from typing import List
+from typing import Dict, Iterator, List
 
 from shelvery.engine import SHELVERY_DO_BACKUP_TAGS
 from shelvery.engine import ShelveryEngine
@@ -12,11 +12,21 @@ from shelvery.backup_resource import BackupResource
 from shelvery.aws_helper import AwsHelper
 
 class ShelveryRedshiftBackup(ShelveryEngine):
-	def __init__(self):
-		ShelveryEngine.__init__(self)
-		self.redshift_client = AwsHelper.boto3_client('redshift', arn=self.role_arn, external_id=self.role_external_id)
-		# default region will be picked up in AwsHelper.boto3_client call
-		self.region = boto3.session.Session().region_name
+	# maximum number of records Redshift describe calls return per page
+	PAGE_SIZE = 100
+
+	def __init__(self, region=None):
+		ShelveryEngine.__init__(self, region)
+		# cluster id -> latest automated snapshot, populated on first use within run
+		self._latest_automated_snapshots = None
+
+	@property
+	def redshift_client(self):
+		return self.get_redshift_client(self.region)
+
+	def get_redshift_client(self, region: str):
+		"""Redshift client for given region, from client pool shared within process"""
+		return AwsHelper.boto3_client('redshift', region_name=region, arn=self.role_arn, external_id=self.role_external_id)
 
 	def get_resource_type(self) -> str:
 		"""Returns entity type that's about to be backed up"""
@@ -32,7 +42,7 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		"""
 		Remove given backup from system
 		"""
-		redshift_client = AwsHelper.boto3_client('redshift', region_name = backup_resource.region, arn=self.role_arn, external_id=self.role_external_id)
+		redshift_client = self.get_redshift_client(backup_resource.region)
 		cluster_id = backup_resource.backup_id.split(":")[-1].split("/")[0]
 		snapshot_id = backup_resource.backup_id.split(":")[-1].split("/")[1]
 		try:
@@ -49,20 +59,21 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 				self.logger.error(ex.response)
 				self.logger.exception(f"Could not delete {backup_resource.backup_id}")
 
-	def get_existing_backups(self, backup_tag_prefix: str) -> List[BackupResource]:
+	def get_existing_backups(self, backup_tag_prefix: str, entity_ids: List[str] = None) -> Iterator[BackupResource]:
 		"""
-		Collect existing backups on system of given type, marked with given tag
+		Collect existing backups on system of given type, marked with given tag.
+		Backups are yielded page by page, as they are returned by the API
 		"""
-		local_region = boto3.session.Session().region_name
+		local_region = self.region
 		marker_tag = f"{backup_tag_prefix}:{BackupResource.BACKUP_MARKER_TAG}"
-		response = self.redshift_client.describe_cluster_snapshots(
-            SnapshotType='manual',
-            TagKeys=[marker_tag],
-            TagValues=SHELVERY_DO_BACKUP_TAGS
-        )
-
-		snapshots = response['Snapshots']
-		backups = []
+		snapshots = self.paginate_clusters(
+			self.redshift_client.describe_cluster_snapshots,
+			'Snapshots',
+			entity_ids,
+			SnapshotType='manual',
+			TagKeys=[marker_tag],
+			TagValues=SHELVERY_DO_BACKUP_TAGS
+		)
 
 		for snap in snapshots:
 			cluster_id = snap['ClusterIdentifier']
@@ -75,20 +86,19 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 			backup_id = f"arn:aws:redshift:{local_region}:{snap['OwnerAccount']}"
 			backup_id = f"{backup_id}:snapshot:{snap['ClusterIdentifier']}/{snap['SnapshotIdentifier']}"
 			backup_resource = BackupResource.construct(
-                backup_tag_prefix,
+				backup_tag_prefix,
 				backup_id,
-                d_tags
-            )
+				d_tags,
+				self.get_target_account_id()
+			)
 			backup_resource.entity_resource = redshift_entity
 			backup_resource.entity_id = redshift_entity.resource_id
 
-			backups.append(backup_resource)
-
-		return backups
+			yield backup_resource
 
-	def get_entities_to_backup(self, tag_name: str) -> List[EntityResource]:
+	def get_entities_to_backup(self, tag_name: str, entity_ids: List[str] = None) -> List[EntityResource]:
 		"""Get all instances that contain `tag_name` as a tag."""
-		clusters = self.collect_clusters(tag_name)
+		clusters = self.collect_clusters(tag_name, entity_ids)
 
 		# TODO: To get the cluster's creation time, we need to query the "events" with the
 		# cluster ID.
@@ -111,21 +121,50 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		return entities
 
 	# collect all clusters tagged with given tag, in paginated manner
-	def collect_clusters(self, tag_name: str):
-		load_clusters = True
-		next_token = ''
-		all_clusters = []
-
-		while load_clusters:
-			tagged_clusters = self.redshift_client.describe_clusters(TagKeys=[tag_name], TagValues=SHELVERY_DO_BACKUP_TAGS)
-			all_clusters = all_clusters + tagged_clusters['Clusters']
-			if 'Marker' in tagged_clusters and len(tagged_clusters['Marker']) > 0:
-				load_clusters = True
-				next_token = tagged_clusters['Marker']
-			else:
-				load_clusters = False
+	def collect_clusters(self, tag_name: str, cluster_ids: List[str] = None) -> Iterator[Dict]:
+		if cluster_ids is None:
+			return self.paginate(
+				self.redshift_client.describe_clusters,
+				'Clusters',
+				TagKeys=[tag_name],
+				TagValues=SHELVERY_DO_BACKUP_TAGS
+			)
 
-		return all_clusters
+		# selected clusters are described by identifier, and checked for tag locally
+		clusters = self.paginate_clusters(self.redshift_client.describe_clusters, 'Clusters', cluster_ids)
+		return (cluster for cluster in clusters
+				if BackupResource.dict_from_boto3_tags(cluster['Tags']).get(tag_name) in SHELVERY_DO_BACKUP_TAGS)
+
+	def paginate_clusters(self, describe_method, result_key: str, cluster_ids: List[str] = None, **kwargs) -> Iterator[Dict]:
+		"""
+		Yield items of paginated Redshift describe call, for each of given cluster identifiers
+		in turn, or for all clusters if cluster identifiers are not given
+		"""
+		if cluster_ids is None:
+			yield from self.paginate(describe_method, result_key, **kwargs)
+			return
+
+		for cluster_id in cluster_ids:
+			try:
+				yield from self.paginate(describe_method, result_key, ClusterIdentifier=cluster_id, **kwargs)
+			except ClientError as e:
+				if e.response['Error']['Code'] != 'ClusterNotFound':
+					raise e
+				self.logger.info(f"Redshift cluster {cluster_id} not found, skipping")
+
+	def paginate(self, describe_method, result_key: str, **kwargs) -> Iterator[Dict]:
+		"""
+		Yield items of Marker-paginated Redshift describe call, fetching next page
+		only once items of previous page have been consumed
+		"""
+		kwargs['MaxRecords'] = self.PAGE_SIZE
+		while True:
+			response = describe_method(**kwargs)
+			yield from response[result_key]
+			if 'Marker' in response and len(response['Marker']) > 0:
+				kwargs['Marker'] = response['Marker']
+			else:
+				return
 
 	def backup_resource(self, backup_resource: BackupResource) -> BackupResource:
 		"""Redshift supports two modes of snapshot functions: a regular cluster snapshot and copying an existing snapshot to a different region.
@@ -144,48 +183,69 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		snapshot = self.redshift_client.create_cluster_snapshot(
 			SnapshotIdentifier=backup_resource.name,
 			ClusterIdentifier=backup_resource.entity_id,
+			Tags=backup_resource.boto3_tags
 		)['Snapshot']
-		backup_resource.backup_id = f"arn:aws:redshift:{backup_resource.region}:{backup_resource.account_id}"
+		backup_resource.backup_id = f"arn:aws:redshift:{backup_resource.region}:{self.get_target_account_id()}"
 		backup_resource.backup_id = f"{backup_resource.backup_id}:snapshot:{snapshot['ClusterIdentifier']}/{snapshot['SnapshotIdentifier']}"
 		return backup_resource
 
 	def backup_from_latest_automated(self, backup_resource: BackupResource):
-		auto_snapshots = self.redshift_client.describe_cluster_snapshots(
-			ClusterIdentifier=backup_resource.entity_id,
-			SnapshotType='automated',
-			# API always returns in date descending order, and we only need last one
-			MaxRecords=20
-		)
-		auto_snapshots = sorted(auto_snapshots['Snapshots'], key=lambda k: k['SnapshotCreateTime'],
-								reverse=True)
+		latest_snapshots = self.get_latest_automated_snapshots()
 
-		if len(auto_snapshots) == 0:
+		if backup_resource.entity_id not in latest_snapshots:
 			self.logger.error(f"There is no latest automated backup for cluster {backup_resource.entity_id},"
 							  f" fallback to REDSHIFT_CREATE_SNAPSHOT mode. Creating snapshot directly on cluster...")
 			return self.backup_from_cluster(backup_resource)
 
-		# TODO handle case when there are no latest automated backups
+		latest_snapshot = latest_snapshots[backup_resource.entity_id]
 		snapshot = self.redshift_client.copy_cluster_snapshot(
-			SourceSnapshotIdentifier=auto_snapshots[0]['SnapshotIdentifier'],
-			SourceSnapshotClusterIdentifier=auto_snapshots[0]['ClusterIdentifier'],
+			SourceSnapshotIdentifier=latest_snapshot['SnapshotIdentifier'],
+			SourceSnapshotClusterIdentifier=latest_snapshot['ClusterIdentifier'],
 			TargetSnapshotIdentifier=backup_resource.name
 		)['Snapshot']
-		backup_resource.backup_id = f"arn:aws:redshift:{backup_resource.region}:{backup_resource.account_id}"
+		backup_resource.backup_id = f"arn:aws:redshift:{backup_resource.region}:{self.get_target_account_id()}"
 		backup_resource.backup_id = f"{backup_resource.backup_id}:snapshot:{snapshot['ClusterIdentifier']}/{snapshot['SnapshotIdentifier']}"
+		# copy_cluster_snapshot does not accept tags, so snapshot copy is tagged separately
+		self.tag_backup_resource(backup_resource)
 		return backup_resource
 
+	def get_latest_automated_snapshots(self) -> Dict[str, Dict]:
+		"""
+		Index of latest automated snapshot per cluster id. Built once per run, out of
+		single paginated listing of all automated snapshots within region
+		"""
+		if self._latest_automated_snapshots is not None:
+			return self._latest_automated_snapshots
+
+		latest_snapshots = {}
+		for snap in self.paginate(self.redshift_client.describe_cluster_snapshots, 'Snapshots', SnapshotType='automated'):
+			# snapshots still being created have no create time yet
+			if 'SnapshotCreateTime' not in snap:
+				continue
+			cluster_id = snap['ClusterIdentifier']
+			if cluster_id not in latest_snapshots or \
+					latest_snapshots[cluster_id]['SnapshotCreateTime'] < snap['SnapshotCreateTime']:
+				latest_snapshots[cluster_id] = snap
+
+		self.logger.info(f"Collected latest automated snapshots for {len(latest_snapshots)} Redshift clusters")
+		self._latest_automated_snapshots = latest_snapshots
+		return latest_snapshots
+
 	def tag_backup_resource(self, backup_resource: BackupResource):
 		"""
-		Create backup resource tags.
+		Create or update backup resource tags changed since they were last persisted.
 		"""
-		# This is unnecessary for Redshift as the tags are included when calling `backup_resource()`.
-		redshift_client = AwsHelper.boto3_client('redshift', region_name = backup_resource.region, arn=self.role_arn, external_id=self.role_external_id)
+		changed_tags = backup_resource.changed_tags
+		if len(changed_tags) == 0:
+			return
+		redshift_client = self.get_redshift_client(backup_resource.region)
 		redshift_client.create_tags(
 			ResourceName=backup_resource.backup_id,
-			Tags=backup_resource.boto3_tags
+			Tags=list(map(lambda k: {'Key': k, 'Value': changed_tags[k]}, changed_tags))
 		)
+		backup_resource.mark_tags_persisted()
 
-	def copy_backup_to_region(self, backup_id: str, region: str) -> str:
+	def copy_backup_to_region(self, backup_id: str, region: str, tags: Dict = None) -> str:
 		"""
 		Copy a backup to another region.
 		This enables cross-region automated backups for the Redshift cluster, so future automated backups
@@ -201,7 +261,7 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		Determine whether backup has completed and is available to be copied
 		to other regions and shared with other AWS accounts
 		"""
-		redshift_client = AwsHelper.boto3_client('redshift', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
+		redshift_client = self.get_redshift_client(backup_region)
 		snapshot_id = backup_id.split(":")[-1].split("/")[1]
 		snapshots = None
 		try:
@@ -223,7 +283,7 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		"""
 		Share backup with another AWS Account
 		"""
-		redshift_client = AwsHelper.boto3_client('redshift', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
+		redshift_client = self.get_redshift_client(backup_region)
 		snapshot_id = backup_id.split(":")[-1].split("/")[1]
 		redshift_client.authorize_snapshot_access(
 			SnapshotIdentifier=snapshot_id,
@@ -235,14 +295,14 @@ class ShelveryRedshiftBackup(ShelveryEngine):
 		"""
 		Get Backup Resource within region, identified by its backup_id
 		"""
-		redshift_client = AwsHelper.boto3_client('redshift', region_name=backup_region, arn=self.role_arn, external_id=self.role_external_id)
+		redshift_client = self.get_redshift_client(backup_region)
 		snapshot_id = backup_id.split(":")[-1].split("/")[1]
 		snapshots = redshift_client.describe_cluster_snapshots(SnapshotIdentifier=snapshot_id)
 		snapshot = snapshots['Snapshots'][0]
 		d_tags = BackupResource.dict_from_boto3_tags(snapshot['Tags'])
-		return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags)
+		return BackupResource.construct(d_tags['shelvery:tag_name'], backup_id, d_tags, self.get_target_account_id())
 
-	def copy_shared_backup(self, source_account: str, source_backup: BackupResource) -> str:
+	def copy_shared_backup(self, source_account: str, source_backup: BackupResource, tags: Dict = None) -> str:
 		"""
 		Copy Shelvery backup that has been shared from another account to account where
 		shelvery is currently running
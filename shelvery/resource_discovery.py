@@ -0,0 +1,93 @@
+import re
+import threading
+from typing import Dict
+
+from shelvery import SHELVERY_DO_BACKUP_TAGS
+from shelvery.aws_helper import AwsHelper
+from shelvery.cache import TtlCache
+
+
+class TaggedResourceDiscovery:
+    """
+    Discovers resources tagged for backup across EC2, RDS and Redshift with single paginated
+    Resource Groups Tagging API listing, rather than each engine scanning its own service.
+    Resources are partitioned by engine type, and listing is cached, so engines running
+    within same run share it
+    """
+
+    # tagging api resource type -> engine type
+    RESOURCE_TYPES = {
+        'ec2:volume': 'ebs',
+        'ec2:instance': 'ec2ami',
+        'rds:db': 'rds',
+        'rds:cluster': 'rds_cluster',
+        'redshift:cluster': 'redshift'
+    }
+
+    RESOURCES_PER_PAGE = 100
+
+    # seconds discovered resources are kept for, long enough to be shared by all engines of single run
+    CACHE_TTL = 300
+
+    cache = TtlCache()
+    _lock = threading.Lock()
+    # listings of different regions, accounts and tags are made in parallel, each only once at a time
+    _listing_locks = {}
+
+    @classmethod
+    def tagged_resources(cls, engine, tag_name: str) -> Dict[str, Dict[str, Dict]]:
+        """
+        Resources tagged with given tag, in account and region of engine
+        :param engine: engine discovering resources, providing role to assume
+        :param tag_name: marker tag, e.g. shelvery:create_backup
+        :return: map engine type->resource id->resource tags
+        """
+        key = (engine.region, engine.role_arn, engine.role_external_id, tag_name)
+        with cls._lock:
+            listing_lock = cls._listing_locks.setdefault(key, threading.Lock())
+        # engines running concurrently wait for single listing, rather than each making their own
+        with listing_lock:
+            resources = cls.cache.get(key, cls.CACHE_TTL)
+            if resources is None:
+                resources = cls.discover(engine, tag_name)
+                cls.cache.put(key, resources)
+        return resources
+
+    @classmethod
+    def discover(cls, engine, tag_name: str) -> Dict[str, Dict[str, Dict]]:
+        client = AwsHelper.boto3_client('resourcegroupstaggingapi', region_name=engine.region,
+                                        arn=engine.role_arn, external_id=engine.role_external_id)
+        resources = dict((engine_type, {}) for engine_type in cls.RESOURCE_TYPES.values())
+        params = {
+            'TagFilters': [{'Key': tag_name, 'Values': SHELVERY_DO_BACKUP_TAGS}],
+            'ResourceTypeFilters': list(cls.RESOURCE_TYPES.keys()),
+            'ResourcesPerPage': cls.RESOURCES_PER_PAGE
+        }
+        discovered = 0
+        while True:
+            response = client.get_resources(**params)
+            for mapping in response['ResourceTagMappingList']:
+                resource_type, resource_id = cls.parse_arn(mapping['ResourceARN'])
+                if resource_type in cls.RESOURCE_TYPES:
+                    tags = dict(map(lambda t: (t['Key'], t['Value']), mapping.get('Tags', [])))
+                    resources[cls.RESOURCE_TYPES[resource_type]][resource_id] = tags
+                    discovered += 1
+            if response.get('PaginationToken'):
+                params['PaginationToken'] = response['PaginationToken']
+            else:
+                break
+
+        engine.logger.info(f"Discovered {discovered} resources tagged with {tag_name}")
+        return resources
+
+    @staticmethod
+    def parse_arn(arn: str):
+        """
+        Split resource arn into tagging api resource type and resource id, e.g.
+        arn:aws:ec2:us-east-1:123456789012:volume/vol-1 into ('ec2:volume', 'vol-1')
+        """
+        parts = arn.split(':', 5)
+        resource = re.split('[/:]', parts[5], 1)
+        if len(resource) < 2:
+            return parts[2], resource[0]
+        return f"{parts[2]}:{resource[0]}", resource[1]
@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import Iterable, Iterator, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+from shelvery.backup_resource import BackupResource
+from shelvery.runtime_config import RuntimeConfig, ResolvedConfig
+
+
+class RetentionEvaluator:
+    """
+    Decides which backups have expired. Backups are grouped by entity configuration
+    overrides and retention type, and retention period is resolved once for each
+    group, rather than for each backup. Expire date of each backup is then its
+    creation date plus retention period of its group.
+
+    If configured to trust expire date stamped on backups, stamped backups are
+    decided by comparing that date with current time, without resolving retention.
+    """
+
+    # backups are evaluated in batches, so backups streamed from engine are not all held in memory
+    BATCH_SIZE = 1000
+
+    def __init__(self, engine, now: datetime = None):
+        self.engine = engine
+        # same clock as BackupResource.is_stale
+        self.now = now if now is not None else datetime.now()
+        self.custom_retention_types = RuntimeConfig.get_custom_retention_types(engine)
+        self.trust_expire_at = RuntimeConfig.trust_expire_at_tag(engine)
+        # stamped dates are sortable, so they can be compared as strings
+        self.now_formatted = self.now.strftime(BackupResource.TIMESTAMP_FORMAT)
+        self._stamped_dates = {}
+        self._periods = {}
+
+    def group_key(self, backup: BackupResource) -> tuple:
+        return ResolvedConfig.overrides(backup.entity_resource_tags()), backup.retention_type
+
+    def retention_period(self, group_key: tuple, backup: BackupResource):
+        if group_key not in self._periods:
+            self._periods[group_key] = BackupResource.retention_period(
+                backup.retention_type,
+                backup.entity_resource_tags(),
+                self.engine,
+                self.custom_retention_types
+            )
+        return self._periods[group_key]
+
+    def evaluate(self, backups: Iterable[BackupResource]) -> Iterator[Tuple[BackupResource, bool, Exception]]:
+        """
+        Evaluate backups for expiry, setting expire_date of each backup
+        :param backups: backups to evaluate, may be generator
+        :return: generator of (backup, is_stale, error) tuples, error being exception
+                 raised resolving retention of backup, or None
+        """
+        batch = []
+        for backup in backups:
+            batch.append(backup)
+            if len(batch) >= self.BATCH_SIZE:
+                yield from self.evaluate_batch(batch)
+                batch = []
+        if len(batch) > 0:
+            yield from self.evaluate_batch(batch)
+
+    def stamped_expire_date(self, expire_at: str) -> datetime:
+        if expire_at not in self._stamped_dates:
+            self._stamped_dates[expire_at] = datetime.strptime(expire_at, BackupResource.TIMESTAMP_FORMAT)
+        return self._stamped_dates[expire_at]
+
+    def evaluate_batch(self, backups: list) -> Iterator[Tuple[BackupResource, bool, Exception]]:
+        groups = {}
+        results = {}
+        for backup in backups:
+            expire_at = backup.expire_at_tag if self.trust_expire_at else None
+            if expire_at is not None:
+                try:
+                    backup.expire_date = self.stamped_expire_date(expire_at)
+                    results[id(backup)] = (self.now_formatted > expire_at, None)
+                except Exception as e:
+                    results[id(backup)] = (False, e)
+                continue
+            groups.setdefault(self.group_key(backup), []).append(backup)
+
+        for group_key, group in groups.items():
+            try:
+                period = self.retention_period(group_key, group[0])
+            except Exception as e:
+                for backup in group:
+                    results[id(backup)] = (False, e)
+                continue
+
+            if period is None:
+                # in case there is no retention tag on backup, we want it kept forever
+                expire_date = datetime.utcnow() + relativedelta(years=10)
+                for backup in group:
+                    backup.expire_date = expire_date
+                    results[id(backup)] = (False, None)
+                continue
+
+            for backup in group:
+                backup.expire_date = backup.date_created + period
+                results[id(backup)] = (self.now > backup.expire_date, None)
+
+        # preserve order backups were received in
+        for backup in backups:
+            is_stale, error = results[id(backup)]
+            yield backup, is_stale, error
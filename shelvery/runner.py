@@ -0,0 +1,76 @@
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from shelvery.aws_helper import AwsHelper
+from shelvery.factory import ShelveryFactory
+
+EngineRun = namedtuple('EngineRun', ['backup_type', 'account_id', 'region', 'status', 'elapsed', 'result'])
+
+
+class ShelveryRunner:
+    """
+    Runs action of several engines concurrently within single process, optionally in several
+    regions and accounts. Engines share client pool, assumed role credentials, account id and
+    data buckets checked for existence
+    """
+
+    STATUS_OK = 'OK'
+    STATUS_ERROR = 'ERROR'
+
+    def __init__(self, action: str, region_concurrency: int = 1, account_concurrency: int = 1,
+                 role_external_id: str = None):
+        self.action = action
+        self.region_concurrency = max(1, region_concurrency)
+        self.account_concurrency = max(1, account_concurrency)
+        self.role_external_id = role_external_id
+        self.logger = logging.getLogger()
+
+    def run(self, backup_types: List[str], regions: List[str] = None, role_arns: List[str] = None) -> List[EngineRun]:
+        """
+        Run action for each of backup types in each of regions, or in region of current session if none given.
+        If role arns are given, action is run in account of each of the roles, otherwise in account of current session
+        """
+        if not role_arns:
+            return self.run_account(backup_types, regions, None)
+
+        # accounts are picked up by workers as they free up, so slow account holds back only its own worker
+        with ThreadPoolExecutor(max_workers=min(self.account_concurrency, len(role_arns))) as executor:
+            account_runs = list(executor.map(lambda role_arn: self.run_account(backup_types, regions, role_arn),
+                                             role_arns))
+        return [engine_run for runs in account_runs for engine_run in runs]
+
+    def run_account(self, backup_types: List[str], regions: List[str], role_arn: str) -> List[EngineRun]:
+        if not regions:
+            return self.run_region(backup_types, AwsHelper.local_region(), role_arn)
+
+        with ThreadPoolExecutor(max_workers=min(self.region_concurrency, len(regions))) as executor:
+            region_runs = list(executor.map(lambda region: self.run_region(backup_types, region, role_arn), regions))
+        return [engine_run for runs in region_runs for engine_run in runs]
+
+    def run_region(self, backup_types: List[str], region: str, role_arn: str) -> List[EngineRun]:
+        # each region has its own worker pool and clients, so region being throttled
+        # does not hold back workers of other regions
+        with ThreadPoolExecutor(max_workers=len(backup_types)) as executor:
+            return list(executor.map(lambda backup_type: self.run_engine(backup_type, region, role_arn), backup_types))
+
+    def run_engine(self, backup_type: str, region: str, role_arn: str) -> EngineRun:
+        account_id = role_arn.split(':')[4] if role_arn is not None else ''
+        started = time.monotonic()
+        try:
+            backup_engine = ShelveryFactory.get_shelvery_instance(backup_type, region)
+            if role_arn is not None:
+                backup_engine.role_arn = role_arn
+                backup_engine.role_external_id = self.role_external_id
+            account_id = backup_engine.get_target_account_id()
+            result = backup_engine.__getattribute__(self.action)()
+            return EngineRun(backup_type, account_id, region, self.STATUS_OK, time.monotonic() - started, result)
+        except Exception as e:
+            self.logger.exception(f"Running {self.action} for {backup_type} in {account_id} {region} failed: {e}")
+            return EngineRun(backup_type, account_id, region, self.STATUS_ERROR, time.monotonic() - started, e)
+
+    @classmethod
+    def succeeded(cls, engine_runs: List[EngineRun]) -> bool:
+        return all(engine_run.status == cls.STATUS_OK for engine_run in engine_runs)
@@ -1,7 +1,48 @@
 import re
 import os
-import boto3
+import json
 
+from collections import OrderedDict
+from types import MappingProxyType
+from threading import Lock
+from typing import List
+
+CONFIG_TAG_PREFIX = 'shelvery:config:'
+
+
+class ResolvedConfig:
+    """
+    Configuration values resolved once from lambda payload, environment variables and
+    defaults. Values are immutable, so lookups are single dictionary access. Resource
+    tag overrides are applied on top of resolved values for each lookup, and parsed
+    values (e.g. account lists) are computed once per resolved configuration
+    """
+
+    def __init__(self, values):
+        self._values = MappingProxyType(dict(values))
+        self._parsed = {}
+        self._parsed_lock = Lock()
+
+    def get(self, key: str, resource_tags=None):
+        if resource_tags is not None:
+            tag_key = f"{CONFIG_TAG_PREFIX}{key}"
+            if tag_key in resource_tags:
+                return resource_tags[tag_key]
+        return self._values.get(key)
+
+    def parsed(self, key: str, parse_fn):
+        """Returns result of parse_fn for key, calling it only on first access"""
+        with self._parsed_lock:
+            if key not in self._parsed:
+                self._parsed[key] = parse_fn(self._values.get(key))
+            return self._parsed[key]
+
+    @staticmethod
+    def overrides(resource_tags) -> tuple:
+        """Configuration overrides within resource tags, usable as key to group resources sharing configuration"""
+        if resource_tags is None:
+            return ()
+        return tuple(sorted((k, v) for k, v in resource_tags.items() if k.startswith(CONFIG_TAG_PREFIX)))
 
 
 class RuntimeConfig:
@@ -42,7 +83,8 @@ class RuntimeConfig:
     shelvery_bucket_name_template - Template used to create bucket name. Available keys: `{account_id}`, `{region}`.
                                     Defaults to `shelvery.data.{account_id}-{region}.base2tools`
 
-    shelvery_select_entity - Filter which entities get backed up, regardless of tags
+    shelvery_select_entity - Filter which entities get backed up or cleaned, comma separated list of entity ids.
+                             Selected entities still need to be tagged to be backed up
 
     shelvery_sns_topic - SNS Topics for shelvery notifications
 
@@ -57,6 +99,28 @@ class RuntimeConfig:
 
     shelvery_ignore_invalid_resource_state - ignore exceptions due to the resource being in a unavailable state,
                                              such as shutdown, rebooting.
+
+    shelvery_describe_cache_ttl - seconds to keep describe and tag results of backups cached within single run,
+                                  defaults to 60. Set to 0 to disable caching
+
+    shelvery_copy_concurrency_per_region - maximum number of backup copies in progress to single
+                                           destination region, defaults to 5. Further copies are queued
+
+    shelvery_trust_expire_at_tag - clean up backups by expire date stamped on creation, rather than
+                                   resolving retention of each backup. Defaults to false
+
+    shelvery_tagged_resource_discovery - discover resources to back up with Resource Groups Tagging API,
+                                         single listing shared by all engines. Defaults to false
+
+    shelvery_regions - regions to create and clean backups in when running from command line, comma separated.
+                       Empty (region of current session) by default
+
+    shelvery_region_concurrency - number of regions processed in parallel, defaults to 4
+
+    shelvery_role_arns - roles to assume in each of accounts managed when running from command line, comma separated.
+                         Empty (account of current session, or role_arn) by default
+
+    shelvery_account_concurrency - number of accounts processed in parallel, defaults to 8
     """
 
     DEFAULT_KEEP_DAILY = 14
@@ -92,14 +156,28 @@ class RuntimeConfig:
         'shelvery_exluded_resource_tag_keys': None,
         'shelvery_sqs_queue_url': None,
         'shelvery_sqs_queue_wait_period': 0,
-        'shelvery_ignore_invalid_resource_state': False
+        'shelvery_ignore_invalid_resource_state': False,
+        'shelvery_describe_cache_ttl': 60,
+        'shelvery_copy_concurrency_per_region': 5,
+        'shelvery_trust_expire_at_tag': False,
+        'shelvery_tagged_resource_discovery': False,
+        'shelvery_regions': None,
+        'shelvery_region_concurrency': 4,
+        'shelvery_role_arns': None,
+        'shelvery_account_concurrency': 8
     }
 
+    # number of distinct resolved configurations kept, most recently used first
+    RESOLVED_CACHE_SIZE = 16
+
+    _resolved = OrderedDict()
+    _resolved_lock = Lock()
+
     @classmethod
     def get_conf_value(cls, key: str, resource_tags=None, lambda_payload=None):
         # priority 3 are resource tags
         if resource_tags is not None:
-            tag_key = f"shelvery:config:{key}"
+            tag_key = f"{CONFIG_TAG_PREFIX}{key}"
             if tag_key in resource_tags:
                 return resource_tags[tag_key]
 
@@ -115,6 +193,42 @@ class RuntimeConfig:
         if key in cls.DEFAULTS:
             return cls.DEFAULTS[key]
 
+    @classmethod
+    def resolve(cls, lambda_payload=None) -> ResolvedConfig:
+        """
+        Resolve all configuration values not coming from resource tags, in order of their priority.
+        Resolved configuration is reused for as long as environment and payload configuration stay same,
+        including across invocations of warm lambda container
+        """
+        payload_config = {}
+        if (lambda_payload is not None) and ('config' in lambda_payload):
+            payload_config = lambda_payload['config']
+        key = (tuple(sorted(os.environ.items())), json.dumps(payload_config, sort_keys=True, default=str))
+
+        with cls._resolved_lock:
+            resolved = cls._resolved.get(key)
+            if resolved is not None:
+                cls._resolved.move_to_end(key)
+                return resolved
+
+        values = dict(cls.DEFAULTS)
+        values.update(os.environ)
+        values.update(payload_config)
+        resolved = ResolvedConfig(values)
+        with cls._resolved_lock:
+            cls._resolved[key] = resolved
+            while len(cls._resolved) > cls.RESOLVED_CACHE_SIZE:
+                cls._resolved.popitem(last=False)
+        return resolved
+
+    @classmethod
+    def get_engine_conf_value(cls, key: str, resource_tags=None, engine=None):
+        # engine resolves its configuration at the start of each operation,
+        # fall back to resolving value on each call otherwise
+        if engine.resolved_config is not None:
+            return engine.resolved_config.get(key, resource_tags)
+        return cls.get_conf_value(key, resource_tags, engine.lambda_payload)
+
     @classmethod
     def is_lambda_runtime(cls, engine) -> bool:
         return engine.aws_request_id != 0 and engine.lambda_payload is not None
@@ -125,23 +239,29 @@ class RuntimeConfig:
 
     @classmethod
     def get_keep_daily(cls, resource_tags=None, engine=None):
-        return int(cls.get_conf_value('shelvery_keep_daily_backups', resource_tags, engine.lambda_payload))
+        return int(cls.get_engine_conf_value('shelvery_keep_daily_backups', resource_tags, engine))
 
     @classmethod
     def get_keep_weekly(cls, resource_tags=None, engine=None):
-        return int(cls.get_conf_value('shelvery_keep_weekly_backups', resource_tags, engine.lambda_payload))
+        return int(cls.get_engine_conf_value('shelvery_keep_weekly_backups', resource_tags, engine))
 
     @classmethod
     def get_keep_monthly(cls, resource_tags=None, engine=None):
-        return int(cls.get_conf_value('shelvery_keep_monthly_backups', resource_tags, engine.lambda_payload))
+        return int(cls.get_engine_conf_value('shelvery_keep_monthly_backups', resource_tags, engine))
 
     @classmethod
     def get_keep_yearly(cls, resource_tags=None, engine=None):
-        return int(cls.get_conf_value('shelvery_keep_yearly_backups', resource_tags, engine.lambda_payload))
+        return int(cls.get_engine_conf_value('shelvery_keep_yearly_backups', resource_tags, engine))
 
     @classmethod
     def get_custom_retention_types(cls, engine=None):
-        custom_retention = cls.get_conf_value('shelvery_custom_retention_types', None, engine.lambda_payload)
+        if engine.resolved_config is not None:
+            return engine.resolved_config.parsed('shelvery_custom_retention_types', cls.parse_custom_retention_types)
+        return cls.parse_custom_retention_types(
+            cls.get_conf_value('shelvery_custom_retention_types', None, engine.lambda_payload))
+
+    @classmethod
+    def parse_custom_retention_types(cls, custom_retention):
         if custom_retention is None or custom_retention.strip() == '':
             return {}
 
@@ -155,7 +275,7 @@ class RuntimeConfig:
 
     @classmethod
     def get_current_retention_type(cls, engine=None):
-        current_retention_type = cls.get_conf_value('shelvery_current_retention_type', None, engine.lambda_payload)
+        current_retention_type = cls.get_engine_conf_value('shelvery_current_retention_type', None, engine)
         if current_retention_type is None or current_retention_type.strip() == '':
             return None
         return current_retention_type
@@ -170,7 +290,7 @@ class RuntimeConfig:
 
     @classmethod
     def get_dr_regions(cls, resource_tags, engine):
-        regions = cls.get_conf_value('shelvery_dr_regions', resource_tags, engine.lambda_payload)
+        regions = cls.get_engine_conf_value('shelvery_dr_regions', resource_tags, engine)
         return [] if regions is None else regions.split(',')
 
     @classmethod
@@ -187,7 +307,7 @@ class RuntimeConfig:
         if cls.is_lambda_runtime(shelvery):
             return (shelvery.lambda_context.get_remaining_time_in_millis() / 1000) - 20
         else:
-            return int(cls.get_conf_value('shelvery_wait_snapshot_timeout', None, shelvery.lambda_payload))
+            return int(cls.get_engine_conf_value('shelvery_wait_snapshot_timeout', None, shelvery))
 
     @classmethod
     def get_max_lambda_wait_iterations(cls):
@@ -196,66 +316,64 @@ class RuntimeConfig:
     @classmethod
     def get_share_with_accounts(cls, shelvery):
         # collect account from env vars
-        accounts = cls.get_conf_value('shelvery_share_aws_account_ids', None, shelvery.lambda_payload)
-
-        if accounts is not None and accounts.strip() == "":
-            return []
-
-        # by default it is empty list
-        accounts = accounts.split(',') if accounts is not None else []
-
-        # validate account format
-        rval = []
-        for acc in accounts:
-            if re.match('^[0-9]{12}$', acc) is None:
-                shelvery.logger.warn(f"Account id {acc} is not 12-digit number, skipping for share")
-            else:
-                rval.append(acc)
-                shelvery.logger.info(f"Collected account {acc} to share backups with")
-
-        return rval
+        return cls.get_account_list('shelvery_share_aws_account_ids', shelvery, 'to share backups with')
 
     @classmethod
     def get_source_backup_accounts(cls, shelvery):
         # collect account from env vars
-        accounts = cls.get_conf_value('shelvery_source_aws_account_ids', None, shelvery.lambda_payload)
-
-        if accounts is not None and accounts.strip() == "":
-            return []
-
-        # by default it is empty list
-        accounts = accounts.split(',') if accounts is not None else []
-
-        # validate account format
-        rval = []
-        for acc in accounts:
-            if re.match('^[0-9]{12}$', acc) is None:
-                shelvery.logger.warn(f"Account id {acc} is not 12-digit number, skipping for share")
-            else:
-                rval.append(acc)
-                shelvery.logger.info(f"Collected account {acc} to collect backups from")
+        return cls.get_account_list('shelvery_source_aws_account_ids', shelvery, 'to collect backups from')
 
-        return rval
+    @classmethod
+    def get_account_list(cls, key, shelvery, purpose):
+        def parse(accounts):
+            if accounts is not None and accounts.strip() == "":
+                return []
+
+            # by default it is empty list
+            accounts = accounts.split(',') if accounts is not None else []
+
+            # validate account format
+            rval = []
+            for acc in accounts:
+                if re.match('^[0-9]{12}$', acc) is None:
+                    shelvery.logger.warn(f"Account id {acc} is not 12-digit number, skipping for share")
+                else:
+                    rval.append(acc)
+                    shelvery.logger.info(f"Collected account {acc} {purpose}")
+
+            return rval
+
+        # accounts are parsed and logged once per resolved configuration
+        if shelvery.resolved_config is not None:
+            return list(shelvery.resolved_config.parsed(key, parse))
+        return parse(cls.get_conf_value(key, None, shelvery.lambda_payload))
 
     @classmethod
     def get_rds_mode(cls, resource_tags, engine):
-        return cls.get_conf_value('shelvery_rds_backup_mode', resource_tags, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_rds_backup_mode', resource_tags, engine)
 
     @classmethod
     def get_redshift_mode(cls, resource_tags, engine):
-        return cls.get_conf_value('shelvery_redshift_backup_mode', resource_tags, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_redshift_backup_mode', resource_tags, engine)
 
     @classmethod
     def get_shelvery_select_entity(cls, engine):
-        val = cls.get_conf_value('shelvery_select_entity', None, engine.lambda_payload)
+        val = cls.get_engine_conf_value('shelvery_select_entity', None, engine)
         if val == '':
             return None
         return val
 
+    @classmethod
+    def get_shelvery_select_entities(cls, engine) -> List[str]:
+        """Entity ids selected by shelvery_select_entity, or empty list if all entities are selected"""
+        val = cls.get_shelvery_select_entity(engine)
+        if val is None:
+            return []
+        return [entity_id.strip() for entity_id in val.split(',') if entity_id.strip() != '']
 
     @classmethod
     def get_sns_topic(cls, engine):
-        return cls.get_conf_value('shelvery_sns_topic', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_sns_topic', None, engine)
 
     @classmethod
     def boto3_retry_times(cls):
@@ -263,26 +381,26 @@ class RuntimeConfig:
 
     @classmethod
     def get_error_sns_topic(cls, engine):
-        topic = cls.get_conf_value('shelvery_error_sns_topic', None, engine.lambda_payload)
+        topic = cls.get_engine_conf_value('shelvery_error_sns_topic', None, engine)
         if topic is None:
-            topic = cls.get_conf_value('shelvery_sns_topic', None, engine.lambda_payload)
+            topic = cls.get_engine_conf_value('shelvery_sns_topic', None, engine)
         return topic
 
     @classmethod
     def get_role_arn(cls, engine):
-        return cls.get_conf_value('role_arn', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('role_arn', None, engine)
 
     @classmethod
     def get_role_external_id(cls, engine):
-        return cls.get_conf_value('role_external_id', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('role_external_id', None, engine)
 
     @classmethod
     def get_bucket_name_template(cls, engine):
-        return cls.get_conf_value('shelvery_bucket_name_template', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_bucket_name_template', None, engine)
 
     @classmethod
     def copy_resource_tags(cls, engine) -> bool:
-        copy_tags = cls.get_conf_value('shelvery_copy_resource_tags', None, engine.lambda_payload)
+        copy_tags = cls.get_engine_conf_value('shelvery_copy_resource_tags', None, engine)
         if copy_tags or copy_tags.lower() == 'true' or copy_tags == 0:
             return True
         else:
@@ -290,7 +408,7 @@ class RuntimeConfig:
 
     @classmethod
     def ignore_invalid_resource_state(cls, engine) -> bool:
-        ignore_state = cls.get_conf_value('shelvery_ignore_invalid_resource_state', None, engine.lambda_payload)
+        ignore_state = cls.get_engine_conf_value('shelvery_ignore_invalid_resource_state', None, engine)
         if ignore_state or ignore_state.lower() == 'true' or ignore_state == 0:
             return True
         else:
@@ -301,15 +419,57 @@ class RuntimeConfig:
         # Exluding the tag_pefix as sthey are not necessary
         # and aws tags as aws is a tag reserved namespace
         keys = [cls.get_tag_prefix(),'aws:']
-        exclude = cls.get_conf_value('shelvery_exluded_resource_tag_keys', None, engine.lambda_payload)
+        exclude = cls.get_engine_conf_value('shelvery_exluded_resource_tag_keys', None, engine)
         if exclude is not None:
             keys += exclude.split(',')
         return keys
 
     @classmethod
     def get_sqs_queue_url(cls, engine):
-        return cls.get_conf_value('shelvery_sqs_queue_url', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_sqs_queue_url', None, engine)
 
     @classmethod
     def get_sqs_queue_wait_period(cls, engine):
-        return cls.get_conf_value('shelvery_sqs_queue_wait_period', None, engine.lambda_payload)
+        return cls.get_engine_conf_value('shelvery_sqs_queue_wait_period', None, engine)
+
+    @classmethod
+    def get_describe_cache_ttl(cls, engine):
+        return int(cls.get_engine_conf_value('shelvery_describe_cache_ttl', None, engine))
+
+    @classmethod
+    def trust_expire_at_tag(cls, engine) -> bool:
+        return str(cls.get_engine_conf_value('shelvery_trust_expire_at_tag', None, engine)).lower() == 'true'
+
+    @classmethod
+    def use_tagged_resource_discovery(cls, engine) -> bool:
+        return str(cls.get_engine_conf_value('shelvery_tagged_resource_discovery', None, engine)).lower() == 'true'
+
+    @classmethod
+    def get_copy_concurrency_per_region(cls, engine):
+        return int(cls.get_engine_conf_value('shelvery_copy_concurrency_per_region', None, engine))
+
+    @classmethod
+    def get_regions(cls, lambda_payload=None) -> List[str]:
+        regions = cls.get_conf_value('shelvery_regions', None, lambda_payload)
+        if regions is None:
+            return []
+        return [region.strip() for region in regions.split(',') if region.strip() != '']
+
+    @classmethod
+    def get_region_concurrency(cls, lambda_payload=None):
+        return int(cls.get_conf_value('shelvery_region_concurrency', None, lambda_payload))
+
+    @classmethod
+    def get_role_arns(cls, lambda_payload=None) -> List[str]:
+        role_arns = cls.get_conf_value('shelvery_role_arns', None, lambda_payload)
+        if role_arns is None:
+            return []
+        role_arns = [arn.strip() for arn in role_arns.split(',') if arn.strip() != '']
+        for arn in role_arns:
+            if re.match('^arn:aws[a-z-]*:iam::[0-9]{12}:role/.+$', arn) is None:
+                raise Exception(f"Role {arn} given in shelvery_role_arns is not valid IAM role ARN")
+        return role_arns
+
+    @classmethod
+    def get_account_concurrency(cls, lambda_payload=None):
+        return int(cls.get_conf_value('shelvery_account_concurrency', None, lambda_payload))
@@ -24,6 +24,7 @@ class ShelveryInvoker:
         is_offload_queueing = RuntimeConfig.is_offload_queueing(engine)
         parameters = {
             'backup_type': engine.get_engine_type(),
+            'region': engine.region,
             'action': method_name,
             'arguments': method_arguments
         }
@@ -44,10 +45,16 @@ class ShelveryInvoker:
                 lambda_client.invoke_async(FunctionName=function_name, InvokeArgs=bytes_payload)
         else:
             resource_type = engine.get_engine_type()
+            region = engine.region
+            role_arn = engine.role_arn
+            role_external_id = engine.role_external_id
 
             def execute():
                 from shelvery.factory import ShelveryFactory
-                backup_engine = ShelveryFactory.get_shelvery_instance(resource_type)
+                backup_engine = ShelveryFactory.get_shelvery_instance(resource_type, region)
+                # operation continues in account of engine invoking it
+                backup_engine.role_arn = role_arn
+                backup_engine.role_external_id = role_external_id
                 method = backup_engine.__getattribute__(method_name)
                 method(method_arguments)
 
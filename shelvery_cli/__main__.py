@@ -27,13 +27,14 @@ def main(args=None):
     if len(args) == 1 and args[0] == 'create_data_buckets':
         args.insert(0, 'ebs')
     if len(args) < 2:
-        print("""Usage: shelvery <backup_type> <action>\n\nBackup types: rds ebs rds_cluster ec2ami redshift
-Actions:\n\tcreate_backups\n\tclean_backups\n\tcreate_data_buckets\n\tpull_shared_backups""")
+        print("""Usage: shelvery <backup_type>[,<backup_type>...] <action>\n\nBackup types: rds ebs rds_cluster ec2ami redshift all
+Multiple backup types are run concurrently within single process.
+Actions:\n\tcreate_backups\n\tclean_backups\n\tcreate_data_buckets\n\tpull_shared_backups\n\tbackfill_expire_dates""")
         exit(-2)
 
     setup_logging()
     main_runner = ShelveryCliMain()
-    main_runner.main(args[0], args[1])
+    exit(main_runner.main(args[0], args[1]))
 
 
 if __name__ == "__main__":
@@ -1,19 +1,74 @@
 import logging
+
 from shelvery.factory import ShelveryFactory
+from shelvery.runner import ShelveryRunner
+from shelvery.runtime_config import RuntimeConfig
 
 
 class ShelveryCliMain:
-    
+
+    # actions run in each of shelvery_regions, when configured
+    REGIONAL_ACTIONS = ['create_backups', 'clean_backups']
+
+    # actions run in account of each of shelvery_role_arns, when configured. Pulling shared backups
+    # reads shared backup data as account of current session, and is not run for other accounts
+    ACCOUNT_ACTIONS = ['create_backups', 'clean_backups', 'backfill_expire_dates']
+
     def main(self, backup_type, action):
-    
+
         logger = logging.getLogger()
         logger.setLevel(logging.INFO)
-        
+
+        backup_types = self.parse_backup_types(backup_type)
+        regions = RuntimeConfig.get_regions() if action in self.REGIONAL_ACTIONS else []
+        role_arns = RuntimeConfig.get_role_arns() if action in self.ACCOUNT_ACTIONS else []
+        if len(backup_types) > 1 or len(regions) > 0 or len(role_arns) > 0:
+            return self.run_engines(backup_types, action, regions, role_arns)
+
         # create backup engine
-        backup_engine = ShelveryFactory.get_shelvery_instance(backup_type)
+        backup_engine = ShelveryFactory.get_shelvery_instance(backup_types[0])
         method = backup_engine.__getattribute__(action)
-        
+
         # start the action
         method()
         return 0
 
+    @staticmethod
+    def parse_backup_types(backup_type):
+        """Backup types given as single type, comma separated list of types, or 'all'"""
+        if backup_type == 'all':
+            return list(ShelveryFactory.ENGINE_TYPES)
+
+        backup_types = [t.strip() for t in backup_type.split(',') if t.strip() != '']
+        unknown_types = [t for t in backup_types if t not in ShelveryFactory.ENGINE_TYPES]
+        if len(backup_types) == 0 or len(unknown_types) > 0:
+            raise Exception(f"Unknown backup type {backup_type}, expecting one or more of "
+                            f"{', '.join(ShelveryFactory.ENGINE_TYPES)}, or 'all'")
+        return backup_types
+
+    def run_engines(self, backup_types, action, regions=None, role_arns=None):
+        """Run action of several engines concurrently, in each of given regions and accounts, and print merged report"""
+        runner = ShelveryRunner(action,
+                                region_concurrency=RuntimeConfig.get_region_concurrency(),
+                                account_concurrency=RuntimeConfig.get_account_concurrency(),
+                                role_external_id=RuntimeConfig.get_conf_value('role_external_id'))
+        engine_runs = runner.run(backup_types, regions, role_arns)
+        self.print_summary(action, engine_runs)
+        return 0 if ShelveryRunner.succeeded(engine_runs) else 1
+
+    @staticmethod
+    def print_summary(action, engine_runs):
+        print(f"\nSummary of {action}:")
+        for engine_run in engine_runs:
+            if isinstance(engine_run.result, Exception):
+                details = str(engine_run.result)
+            elif isinstance(engine_run.result, list):
+                details = f"{len(engine_run.result)} backups"
+            else:
+                details = ''
+            print(f"\t{engine_run.account_id:<14} {engine_run.region:<16} {engine_run.backup_type:<12} "
+                  f"{engine_run.status:<6} {engine_run.elapsed:8.1f}s  {details}")
+        failed = [engine_run for engine_run in engine_runs if engine_run.status != ShelveryRunner.STATUS_OK]
+        if len(failed) > 0:
+            failed_accounts = sorted(set(engine_run.account_id for engine_run in failed))
+            print(f"{len(failed)} of {len(engine_runs)} runs failed, in accounts {', '.join(failed_accounts)}")
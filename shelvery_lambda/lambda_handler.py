@@ -28,8 +28,10 @@ def lambda_handler(event, context):
     backup_type = payload['backup_type']
     action = payload['action']
 
-    # create backup engine
-    backup_engine = ShelveryFactory.get_shelvery_instance(backup_type)
+    # create backup engine, for region given in payload or region lambda is running in.
+    # engine holds state of single invocation only - identity, clients, credentials, data buckets
+    # and resolved configuration are kept at module level, and reused by warm container
+    backup_engine = ShelveryFactory.get_shelvery_instance(backup_type, payload.get('region'))
     backup_engine.set_lambda_environment(payload, context)
 
     method = backup_engine.__getattribute__(action)
@@ -0,0 +1,77 @@
+import sys
+import threading
+import unittest
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.aws_helper import AwsHelper
+
+ROLE_ARN = 'arn:aws:iam::210987654321:role/shelvery'
+
+
+def pool_lock_free():
+    """True if pool lock can be taken by other thread, i.e. is not held by caller"""
+    acquired = []
+
+    def try_lock():
+        acquired.append(AwsHelper._lock.acquire(timeout=1))
+        if acquired[0]:
+            AwsHelper._lock.release()
+
+    thread = threading.Thread(target=try_lock)
+    thread.start()
+    thread.join()
+    return acquired[0]
+
+
+class ShelveryAwsHelperTestCase(unittest.TestCase):
+    """Shelvery client pool tests"""
+
+    def setUp(self):
+        AwsHelper._clients = {}
+        AwsHelper._credentials = {}
+        self.assumed = 0
+
+    def tearDown(self):
+        AwsHelper._clients = {}
+        AwsHelper._credentials = {}
+
+    def assume_role(self, arn, external_id):
+        # role is assumed with pool lock free, as assuming role takes pool lock for sts client
+        self.assertTrue(pool_lock_free())
+        self.assumed += 1
+        # first credentials are already due for renewal
+        expires_in = timedelta(minutes=1) if self.assumed == 1 else timedelta(hours=1)
+        return {'AccessKeyId': f"AKIA{self.assumed}", 'SecretAccessKey': 'secret', 'SessionToken': 'token',
+                'Expiration': datetime.now(timezone.utc) + expires_in}
+
+    @staticmethod
+    def create_boto3_client(service_name, region_name, credentials=None):
+        return service_name, region_name, credentials['AccessKeyId']
+
+    def test_ClientCreatedWithCredentialsStoredUnder(self):
+        with patch.object(AwsHelper, 'assume_role', side_effect=self.assume_role), \
+                patch.object(AwsHelper, 'create_boto3_client', side_effect=self.create_boto3_client):
+            client = AwsHelper.boto3_client('ec2', 'us-east-1', ROLE_ARN)
+            # credentials are looked up once per client, so client is not created with renewed credentials
+            self.assertEqual(client, ('ec2', 'us-east-1', 'AKIA1'))
+            self.assertEqual(AwsHelper._clients[('ec2', 'us-east-1', ROLE_ARN, None)][0], 'AKIA1')
+
+            # credentials are renewed once they are about to expire, and client is recreated with them
+            client = AwsHelper.boto3_client('ec2', 'us-east-1', ROLE_ARN)
+            self.assertEqual(client, ('ec2', 'us-east-1', 'AKIA2'))
+            self.assertIs(AwsHelper.boto3_client('ec2', 'us-east-1', ROLE_ARN), client)
+            self.assertEqual(self.assumed, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import json
+import tracemalloc
+import unittest
+import yaml
+import os
+from datetime import datetime
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.backup_resource import BackupResource
+from shelvery.entity_resource import EntityResource
+
+
+def snapshot_tags_response(i):
+    # strings parsed from API response are distinct objects for each backup
+    date_created = f"2019-{i % 12 + 1:02d}-{i % 28 + 1:02d}-0100"
+    name = f"vol-{i:017x}-{date_created}-daily"
+    return json.dumps([{'Key': k, 'Value': v} for k, v in [
+        ('Name', name),
+        ('shelvery:tag_name', 'shelvery'),
+        ('shelvery:date_created', date_created),
+        ('shelvery:src_account', '123456789012'),
+        ('shelvery:name', name),
+        ('shelvery:region', 'us-east-1'),
+        ('shelvery:retention_type', 'daily'),
+        ('shelvery:entity_id', f"vol-{i:017x}"),
+        ('shelvery:backup', 'true'),
+        ('shelvery:dr_regions', 'us-west-2')
+    ]])
+
+
+class ShelveryBackupResourceTestCase(unittest.TestCase):
+    """Shelvery backup model tests"""
+
+    def construct_backup(self, i, response):
+        tags = BackupResource.dict_from_boto3_tags(json.loads(response))
+        return BackupResource.construct('shelvery', f"snap-{i:017x}", tags)
+
+    def test_YamlFormatCompatible(self):
+        backup = self.construct_backup(1, snapshot_tags_response(1))
+        backup.entity_resource = EntityResource('vol-1', 'us-east-1', datetime(2019, 1, 1), {'Name': 'volume'})
+        serialized = yaml.dump(backup, default_flow_style=False)
+
+        # attribute names are same as in metadata written by earlier versions
+        state = yaml.load(serialized.replace('!!python/object:shelvery.backup_resource.BackupResource', '')
+                          .replace('!!python/object:shelvery.entity_resource.EntityResource', ''),
+                          Loader=yaml.Loader)
+        self.assertEqual(state['_BackupResource__region'], 'us-east-1')
+        self.assertEqual(state['entity_resource']['tags'], {'Name': 'volume'})
+        self.assertNotIn('_persisted_tags', state)
+
+        restored = yaml.load(serialized, Loader=yaml.Loader)
+        self.assertEqual(restored.region, backup.region)
+        self.assertEqual(restored.tags, backup.tags)
+        self.assertEqual(restored.date_created, backup.date_created)
+        self.assertEqual(restored.entity_resource.resource_id, 'vol-1')
+
+    def test_CompactModel(self):
+        first = self.construct_backup(1, snapshot_tags_response(1))
+        second = self.construct_backup(85, snapshot_tags_response(85))
+        entity = EntityResource('vol-1', 'us-east-1', datetime(2019, 1, 1), {})
+
+        # models are slotted, rather than carrying dictionary per instance
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertFalse(hasattr(entity, '__dict__'))
+
+        # tag keys and short repeating values parsed from distinct responses share single copy
+        for key in first.tags:
+            second_key = next(k for k in second.tags if k == key)
+            self.assertIs(key, second_key)
+        self.assertIs(first.tags['shelvery:region'], second.tags['shelvery:region'])
+        self.assertIs(first.tags['shelvery:retention_type'], second.tags['shelvery:retention_type'])
+        self.assertIs(first.tags['shelvery:date_created'], second.tags['shelvery:date_created'])
+
+    @unittest.skipUnless(os.environ.get('SHELVERY_BENCHMARK') == '1', 'benchmarks run with SHELVERY_BENCHMARK=1')
+    def test_Benchmark100kBackupsMemory(self):
+        responses = [snapshot_tags_response(i) for i in range(100000)]
+        tracemalloc.start()
+        try:
+            backups = [self.construct_backup(i, response) for i, response in enumerate(responses)]
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        per_backup = current // len(backups)
+        print(f"{len(backups)} backups use {current // 1024} KiB, {per_backup} bytes per backup")
+        # about 2100 bytes per backup with dictionary based model and distinct tag strings
+        self.assertLess(per_backup, 1300)
+
+
+if __name__ == '__main__':
+    unittest.main()
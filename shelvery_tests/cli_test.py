@@ -0,0 +1,82 @@
+import sys
+import time
+import unittest
+import os
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery_cli.shelver_cli_main import ShelveryCliMain
+from shelvery.runner import ShelveryRunner, EngineRun
+from shelvery.runtime_config import RuntimeConfig
+
+
+class RecordingRunner(ShelveryRunner):
+    """Runner recording engines run, failing for redshift, and slow in account 111111111111"""
+
+    def run_engine(self, backup_type, region, role_arn):
+        account_id = role_arn.split(':')[4] if role_arn is not None else '123456789012'
+        if account_id == '111111111111':
+            time.sleep(0.5)
+        status = self.STATUS_ERROR if backup_type == 'redshift' else self.STATUS_OK
+        return EngineRun(backup_type, account_id, region, status, time.monotonic(), [])
+
+
+class ShelveryCliTestCase(unittest.TestCase):
+    """Shelvery command line tests"""
+
+    def test_ParseBackupTypes(self):
+        self.assertEqual(ShelveryCliMain.parse_backup_types('ebs'), ['ebs'])
+        self.assertEqual(ShelveryCliMain.parse_backup_types('ebs,rds'), ['ebs', 'rds'])
+        self.assertEqual(ShelveryCliMain.parse_backup_types('all'),
+                         ['ebs', 'rds', 'rds_cluster', 'ec2ami', 'redshift'])
+        with self.assertRaises(Exception):
+            ShelveryCliMain.parse_backup_types('ebs,s3')
+
+    def test_ParseRegions(self):
+        self.assertEqual(RuntimeConfig.get_regions({'config': {}}), [])
+        self.assertEqual(RuntimeConfig.get_regions({'config': {'shelvery_regions': 'us-east-1, eu-west-1,'}}),
+                         ['us-east-1', 'eu-west-1'])
+
+    def test_RunInRegions(self):
+        runner = RecordingRunner('create_backups', 2)
+        engine_runs = runner.run(['ebs', 'rds'], ['us-east-1', 'eu-west-1', 'ap-southeast-2'])
+        # results are merged in order of regions and backup types
+        self.assertEqual([(r.region, r.backup_type) for r in engine_runs], [
+            ('us-east-1', 'ebs'), ('us-east-1', 'rds'),
+            ('eu-west-1', 'ebs'), ('eu-west-1', 'rds'),
+            ('ap-southeast-2', 'ebs'), ('ap-southeast-2', 'rds')
+        ])
+        self.assertTrue(ShelveryRunner.succeeded(engine_runs))
+        self.assertFalse(ShelveryRunner.succeeded(runner.run(['ebs', 'redshift'], ['us-east-1', 'eu-west-1'])))
+
+    def test_ParseRoleArns(self):
+        self.assertEqual(RuntimeConfig.get_role_arns({'config': {}}), [])
+        self.assertEqual(RuntimeConfig.get_role_arns({'config': {
+            'shelvery_role_arns': 'arn:aws:iam::111111111111:role/shelvery,arn:aws:iam::222222222222:role/shelvery'
+        }}), ['arn:aws:iam::111111111111:role/shelvery', 'arn:aws:iam::222222222222:role/shelvery'])
+        with self.assertRaises(Exception):
+            RuntimeConfig.get_role_arns({'config': {'shelvery_role_arns': '111111111111'}})
+
+    def test_RunInAccounts(self):
+        role_arns = [f"arn:aws:iam::{account_id}:role/shelvery" for account_id in
+                     ['111111111111', '222222222222', '333333333333', '444444444444']]
+        runner = RecordingRunner('create_backups', account_concurrency=2)
+        started = time.monotonic()
+        engine_runs = runner.run(['ebs', 'rds'], None, role_arns)
+        self.assertEqual([r.account_id for r in engine_runs], [
+            '111111111111', '111111111111', '222222222222', '222222222222',
+            '333333333333', '333333333333', '444444444444', '444444444444'
+        ])
+        # slow account occupies single worker, other accounts complete on the other one meanwhile
+        finished = dict((r.account_id, r.elapsed - started) for r in engine_runs)
+        self.assertLess(finished['444444444444'], finished['111111111111'])
+
+
+if __name__ == '__main__':
+    unittest.main()
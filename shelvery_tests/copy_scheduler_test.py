@@ -0,0 +1,74 @@
+import sys
+import threading
+import time
+import unittest
+import os
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.copy_scheduler import CopyScheduler
+
+
+class ShelveryCopySchedulerTestCase(unittest.TestCase):
+    """Shelvery cross region copy scheduler tests"""
+
+    def run_copies(self, scheduler, jobs, limit):
+        started = []
+        in_flight = {'current': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def copy(job_id, region, priority):
+            scheduler.acquire(region, limit, priority)
+            with lock:
+                started.append(job_id)
+                in_flight['current'] += 1
+                in_flight['peak'] = max(in_flight['peak'], in_flight['current'])
+            time.sleep(0.02)
+            with lock:
+                in_flight['current'] -= 1
+            scheduler.release(region)
+
+        threads = []
+        for job_id, region, priority in jobs:
+            thread = threading.Thread(target=copy, args=(job_id, region, priority))
+            thread.start()
+            threads.append(thread)
+            # keep order of arrival deterministic
+            time.sleep(0.002)
+        for thread in threads:
+            thread.join()
+        return started, in_flight['peak']
+
+    def test_LimitsCopiesPerRegion(self):
+        scheduler = CopyScheduler()
+        started, peak = self.run_copies(scheduler, [(i, 'us-west-2', 0) for i in range(10)], 3)
+        self.assertEqual(peak, 3)
+        self.assertEqual(started, list(range(10)))
+        self.assertEqual(scheduler.metrics(), {'us-west-2': {'queue_depth': 0, 'in_flight': 0}})
+
+    def test_PriorityCopiesStartFirst(self):
+        scheduler = CopyScheduler()
+        jobs = [(i, 'us-west-2', 0) for i in range(5)] + [('retry', 'us-west-2', -1)]
+        started, _ = self.run_copies(scheduler, jobs, 1)
+        # first copy starts immediately, retried copy is next in queue
+        self.assertEqual(started[:2], [0, 'retry'])
+
+    def test_RegionsHaveSeparateLimits(self):
+        scheduler = CopyScheduler()
+        scheduler.acquire('us-west-1', 1)
+        # copy to another region is not blocked by us-west-1 limit
+        scheduler.acquire('us-west-2', 1)
+        self.assertEqual(scheduler.metrics()['us-west-1']['in_flight'], 1)
+        self.assertEqual(scheduler.metrics()['us-west-2']['in_flight'], 1)
+        scheduler.release('us-west-1')
+        scheduler.release('us-west-2')
+
+
+if __name__ == '__main__':
+    unittest.main()
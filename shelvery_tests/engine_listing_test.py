@@ -0,0 +1,186 @@
+import sys
+import unittest
+import os
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery import SHELVERY_DO_BACKUP_TAGS
+from shelvery.aws_helper import AwsHelper
+from shelvery.ebs_backup import ShelveryEBSBackup
+from shelvery.ec2ami_backup import ShelveryEC2AMIBackup
+from shelvery.rds_backup import ShelveryRDSBackup
+from shelvery.redshift_backup import ShelveryRedshiftBackup
+
+REGION = 'us-east-1'
+ACCOUNT_ID = '123456789012'
+
+
+def backup_tags(entity_id):
+    return [{'Key': k, 'Value': v} for k, v in [
+        ('shelvery:tag_name', 'shelvery'),
+        ('shelvery:date_created', '2019-01-01-0100'),
+        ('shelvery:name', f"{entity_id}-2019-01-01-0100-daily"),
+        ('shelvery:region', REGION),
+        ('shelvery:retention_type', 'daily'),
+        ('shelvery:entity_id', entity_id),
+        ('shelvery:backup', 'true')
+    ]]
+
+
+class EngineListingTestCase(unittest.TestCase):
+    """Base for engine listing tests, replacing pooled clients with stubbed ones"""
+
+    def setUp(self):
+        self._pooled_clients = AwsHelper._clients
+        AwsHelper._clients = {}
+        self.stubbers = []
+
+    def tearDown(self):
+        for stubber in self.stubbers:
+            stubber.assert_no_pending_responses()
+            stubber.deactivate()
+        AwsHelper._clients = self._pooled_clients
+
+    def stub_client(self, service_name: str) -> Stubber:
+        """Stubber for pooled client of service in test region, as used by engines without role"""
+        client = boto3.client(service_name, region_name=REGION, aws_access_key_id='test',
+                              aws_secret_access_key='test')
+        AwsHelper._clients[(service_name, REGION, None, None)] = (None, client)
+        stubber = Stubber(client)
+        stubber.activate()
+        self.stubbers.append(stubber)
+        return stubber
+
+    @staticmethod
+    def engine(engine_class):
+        engine = engine_class(REGION)
+        engine._account_id = ACCOUNT_ID
+        return engine
+
+
+class ShelveryEC2AMIListingTestCase(EngineListingTestCase):
+    """Shelvery AMI engine listing tests"""
+
+    BACKUP_FILTERS = [{'Name': 'tag:shelvery:backup', 'Values': ['true']}]
+
+    def test_ExistingBackupsAfterEmptyPage(self):
+        ec2 = self.stub_client('ec2')
+        ec2.add_response('describe_images', {'Images': [], 'NextToken': 'page-2'},
+                         {'Filters': self.BACKUP_FILTERS})
+        ec2.add_response('describe_images', {'Images': [{'ImageId': 'ami-1', 'Tags': backup_tags('i-1')}]},
+                         {'Filters': self.BACKUP_FILTERS, 'NextToken': 'page-2'})
+        ec2.add_response('describe_instances', {'Reservations': [{'Instances': [
+            {'InstanceId': 'i-1', 'LaunchTime': datetime(2019, 1, 1), 'Tags': []}
+        ]}]}, {'Filters': []})
+
+        backups = list(self.engine(ShelveryEC2AMIBackup).get_existing_backups('shelvery'))
+        self.assertEqual([backup.backup_id for backup in backups], ['ami-1'])
+        self.assertEqual(backups[0].entity_resource.resource_id, 'i-1')
+
+
+class ShelverySelectedEntitiesListingTestCase(EngineListingTestCase):
+    """
+    Engines describe only entities selected by shelvery_select_entity. Stubbed calls fail
+    on any parameters other than expected, so unselected entities are never requested
+    """
+
+    TAG_NAME = 'shelvery:create_backup'
+
+    def test_EBSVolumesToBackup(self):
+        ec2 = self.stub_client('ec2')
+        ec2.add_response('describe_volumes', {'Volumes': [{'VolumeId': 'vol-1', 'CreateTime': datetime(2019, 1, 1)}]},
+                         {'Filters': [{'Name': f"tag:{self.TAG_NAME}", 'Values': SHELVERY_DO_BACKUP_TAGS},
+                                      {'Name': 'volume-id', 'Values': ['vol-1', 'vol-2']}],
+                          'NextToken': ''})
+
+        volumes = self.engine(ShelveryEBSBackup).collect_volumes(self.TAG_NAME, ['vol-1', 'vol-2'])
+        self.assertEqual([volume['VolumeId'] for volume in volumes], ['vol-1'])
+
+    def test_EBSExistingBackups(self):
+        ec2 = self.stub_client('ec2')
+        ec2.add_response('describe_snapshots', {'Snapshots': [
+            {'SnapshotId': 'snap-1', 'VolumeId': 'vol-1', 'Tags': backup_tags('vol-1')}
+        ]}, {'Filters': [{'Name': 'tag:shelvery:backup', 'Values': ['true']},
+                         {'Name': 'tag:shelvery:entity_id', 'Values': ['vol-1', 'vol-2']}],
+             'MaxResults': ShelveryEBSBackup.SNAPSHOTS_PAGE_SIZE})
+        # only volumes of listed backups are described
+        ec2.add_response('describe_volumes', {'Volumes': []}, {'Filters': [{'Name': 'volume-id', 'Values': ['vol-1']}]})
+
+        backups = list(self.engine(ShelveryEBSBackup).get_existing_backups('shelvery', ['vol-1', 'vol-2']))
+        self.assertEqual([backup.entity_id for backup in backups], ['vol-1'])
+
+    def test_RDSInstancesToBackup(self):
+        rds = self.stub_client('rds')
+        rds.add_response('describe_db_instances', {'DBInstances': [
+            {'DBInstanceIdentifier': 'db-1', 'InstanceCreateTime': datetime(2019, 1, 1),
+             'TagList': [{'Key': self.TAG_NAME, 'Value': 'true'}]}
+        ]}, {'Filters': [{'Name': 'db-instance-id', 'Values': ['db-1', 'db-2']}]})
+
+        entities = self.engine(ShelveryRDSBackup).get_entities_to_backup(self.TAG_NAME, ['db-1', 'db-2'])
+        self.assertEqual([entity.resource_id for entity in entities], ['db-1'])
+
+    def test_RDSExistingBackups(self):
+        rds = self.stub_client('rds')
+        selected = {'Filters': [{'Name': 'db-instance-id', 'Values': ['db-1']}]}
+        rds.add_response('describe_db_snapshots', {'DBSnapshots': [
+            {'DBSnapshotIdentifier': 'snap-1', 'DBInstanceIdentifier': 'db-1', 'TagList': backup_tags('db-1')}
+        ]}, dict(selected, SnapshotType='manual'))
+        rds.add_response('describe_db_instances', {'DBInstances': [
+            {'DBInstanceIdentifier': 'db-1', 'InstanceCreateTime': datetime(2019, 1, 1), 'TagList': []}
+        ]}, selected)
+
+        backups = list(self.engine(ShelveryRDSBackup).get_existing_backups('shelvery', ['db-1']))
+        self.assertEqual([backup.backup_id for backup in backups], ['snap-1'])
+        self.assertEqual(backups[0].entity_resource.resource_id, 'db-1')
+
+    def test_RedshiftClustersToBackup(self):
+        redshift = self.stub_client('redshift')
+        redshift.add_response('describe_clusters', {'Clusters': [
+            {'ClusterIdentifier': 'dw-1', 'ClusterStatus': 'available', 'Tags': [{'Key': self.TAG_NAME, 'Value': 'true'}]}
+        ]}, {'ClusterIdentifier': 'dw-1', 'MaxRecords': ShelveryRedshiftBackup.PAGE_SIZE})
+        redshift.add_response('describe_clusters', {'Clusters': [
+            {'ClusterIdentifier': 'dw-2', 'ClusterStatus': 'available', 'Tags': []}
+        ]}, {'ClusterIdentifier': 'dw-2', 'MaxRecords': ShelveryRedshiftBackup.PAGE_SIZE})
+
+        entities = self.engine(ShelveryRedshiftBackup).get_entities_to_backup(self.TAG_NAME, ['dw-1', 'dw-2'])
+        # selected clusters without marker tag are not backed up
+        self.assertEqual([entity.resource_id for entity in entities], ['dw-1'])
+
+    def test_RedshiftExistingBackupsOfMissingCluster(self):
+        redshift = self.stub_client('redshift')
+        params = {'SnapshotType': 'manual', 'TagKeys': ['shelvery:backup'], 'TagValues': SHELVERY_DO_BACKUP_TAGS,
+                  'MaxRecords': ShelveryRedshiftBackup.PAGE_SIZE}
+        redshift.add_client_error('describe_cluster_snapshots', 'ClusterNotFound',
+                                  expected_params=dict(params, ClusterIdentifier='dw-deleted'))
+        redshift.add_response('describe_cluster_snapshots', {'Snapshots': [
+            {'SnapshotIdentifier': 'snap-1', 'ClusterIdentifier': 'dw-1', 'OwnerAccount': ACCOUNT_ID,
+             'ClusterCreateTime': datetime(2019, 1, 1), 'Tags': backup_tags('dw-1')}
+        ]}, dict(params, ClusterIdentifier='dw-1'))
+
+        backups = list(self.engine(ShelveryRedshiftBackup).get_existing_backups('shelvery', ['dw-deleted', 'dw-1']))
+        self.assertEqual([backup.backup_id for backup in backups],
+                         [f"arn:aws:redshift:{REGION}:{ACCOUNT_ID}:snapshot:dw-1/snap-1"])
+
+    def test_RedshiftOtherErrorsRaised(self):
+        redshift = self.stub_client('redshift')
+        redshift.add_client_error('describe_clusters', 'AccessDenied',
+                                  expected_params={'ClusterIdentifier': 'dw-1',
+                                                   'MaxRecords': ShelveryRedshiftBackup.PAGE_SIZE})
+
+        with self.assertRaises(ClientError):
+            list(self.engine(ShelveryRedshiftBackup).collect_clusters(self.TAG_NAME, ['dw-1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import sys
+import subprocess
+import unittest
+import os
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.factory import ShelveryFactory
+
+ENGINE_MODULES = [module_name for module_name, _ in ShelveryFactory.ENGINE_CLASSES.values()]
+
+
+def import_times(statement):
+    """
+    Run statement in fresh interpreter with python -X importtime. Returns names of modules
+    loaded once statement completes, and total import time in microseconds
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              f"{statement}\nimport sys\nprint('\\n'.join(sys.modules))"],
+                             cwd=f"{pwd}/..", stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    total = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # top level imports are not indented
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return set(process.stdout.splitlines()), total
+
+
+class ShelveryImportTimeTestCase(unittest.TestCase):
+    """Shelvery cold start import time benchmarks"""
+
+    def test_HandlerImportsNoEngine(self):
+        modules, total = import_times('import shelvery_lambda.lambda_handler')
+        print(f"lambda_handler imports in {total / 1000:.1f}ms")
+        for module_name in ENGINE_MODULES + ['shelvery.engine', 'boto3', 'yaml']:
+            self.assertNotIn(module_name, modules)
+
+    def test_ColdStartPerBackupType(self):
+        for backup_type, (module_name, _) in ShelveryFactory.ENGINE_CLASSES.items():
+            modules, total = import_times('import shelvery_lambda.lambda_handler\n'
+                                          'from shelvery.factory import ShelveryFactory\n'
+                                          f"ShelveryFactory.get_engine_class('{backup_type}')")
+            print(f"{backup_type:<12} engine imports in {total / 1000:.1f}ms")
+            self.assertIn(module_name, modules)
+            # only requested engine is imported, ec2ami extending ec2 base engine
+            other_engines = [m for m in ENGINE_MODULES if m != module_name and m in modules]
+            self.assertEqual(other_engines, [])
+            # backup metadata serialisation is imported only by actions reading or writing it
+            self.assertNotIn('yaml', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import logging
+import threading
+import unittest
+import os
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.resource_discovery import TaggedResourceDiscovery
+from shelvery.cache import TtlCache
+
+
+class CountingDiscovery(TaggedResourceDiscovery):
+    """Discovery returning fixed resources, counting listings made"""
+
+    cache = TtlCache()
+    listings = 0
+
+    @classmethod
+    def discover(cls, engine, tag_name):
+        cls.listings += 1
+        return {'ebs': {'vol-1': {tag_name: 'true'}}}
+
+
+class BlockingDiscovery(TaggedResourceDiscovery):
+    """Discovery where listing of us-east-1 completes only once listing of eu-west-1 has started"""
+
+    cache = TtlCache()
+    _listing_locks = {}
+    listing_started = threading.Event()
+    other_region_listed = threading.Event()
+
+    @classmethod
+    def discover(cls, engine, tag_name):
+        if engine.region == 'us-east-1':
+            cls.listing_started.set()
+            if not cls.other_region_listed.wait(timeout=5):
+                raise Exception('Listing of other region waited for listing of us-east-1')
+        else:
+            cls.other_region_listed.set()
+        return {'ebs': {}}
+
+
+class DiscoveryTestEngine:
+
+    def __init__(self, role_arn=None, region='us-east-1'):
+        self.region = region
+        self.role_arn = role_arn
+        self.role_external_id = None
+        self.logger = logging.getLogger()
+
+
+class ShelveryResourceDiscoveryTestCase(unittest.TestCase):
+    """Shelvery tagged resource discovery tests"""
+
+    def test_ParseArn(self):
+        self.assertEqual(TaggedResourceDiscovery.parse_arn('arn:aws:ec2:us-east-1:123456789012:volume/vol-1'),
+                         ('ec2:volume', 'vol-1'))
+        self.assertEqual(TaggedResourceDiscovery.parse_arn('arn:aws:ec2:us-east-1:123456789012:instance/i-1'),
+                         ('ec2:instance', 'i-1'))
+        self.assertEqual(TaggedResourceDiscovery.parse_arn('arn:aws:rds:us-east-1:123456789012:db:my-db'),
+                         ('rds:db', 'my-db'))
+        self.assertEqual(TaggedResourceDiscovery.parse_arn('arn:aws:rds:us-east-1:123456789012:cluster:my-cluster'),
+                         ('rds:cluster', 'my-cluster'))
+        self.assertEqual(TaggedResourceDiscovery.parse_arn('arn:aws:redshift:us-east-1:123456789012:cluster:dw'),
+                         ('redshift:cluster', 'dw'))
+
+    def test_ListingSharedByEngines(self):
+        CountingDiscovery.tagged_resources(DiscoveryTestEngine(), 'shelvery:create_backup')
+        resources = CountingDiscovery.tagged_resources(DiscoveryTestEngine(), 'shelvery:create_backup')
+        self.assertEqual(resources['ebs'], {'vol-1': {'shelvery:create_backup': 'true'}})
+        self.assertEqual(CountingDiscovery.listings, 1)
+
+        # resources of other accounts are listed separately
+        CountingDiscovery.tagged_resources(DiscoveryTestEngine('arn:aws:iam::210987654321:role/shelvery'),
+                                           'shelvery:create_backup')
+        self.assertEqual(CountingDiscovery.listings, 2)
+
+        # as are resources of other regions
+        CountingDiscovery.tagged_resources(DiscoveryTestEngine(region='eu-west-1'), 'shelvery:create_backup')
+        self.assertEqual(CountingDiscovery.listings, 3)
+
+    def test_RegionsListedInParallel(self):
+        thread = threading.Thread(target=BlockingDiscovery.tagged_resources,
+                                  args=(DiscoveryTestEngine(), 'shelvery:create_backup'))
+        thread.start()
+        BlockingDiscovery.listing_started.wait(timeout=5)
+        # listing of other region does not wait for listing of us-east-1 in progress
+        BlockingDiscovery.tagged_resources(DiscoveryTestEngine(region='eu-west-1'), 'shelvery:create_backup')
+        thread.join()
+        self.assertIsNotNone(BlockingDiscovery.cache.get(('us-east-1', None, None, 'shelvery:create_backup'),
+                                                         BlockingDiscovery.CACHE_TTL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import sys
+import time
+import random
+import logging
+import unittest
+import os
+from datetime import datetime, timedelta
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.retention import RetentionEvaluator
+from shelvery.runtime_config import RuntimeConfig
+from shelvery.backup_resource import BackupResource
+from shelvery.entity_resource import EntityResource
+
+
+class RetentionTestEngine:
+    """Minimal engine providing configuration to retention evaluation"""
+
+    def __init__(self, config=None):
+        self.lambda_payload = {'config': config or {}}
+        self.logger = logging.getLogger()
+        self.resolved_config = RuntimeConfig.resolve(self.lambda_payload)
+
+
+def create_backup(date_created, retention_type, entity_tags=None):
+    tags = {
+        'shelvery:name': f"backup-{date_created.strftime(BackupResource.TIMESTAMP_FORMAT)}-{retention_type}",
+        'shelvery:retention_type': retention_type,
+        'shelvery:date_created': date_created.strftime(BackupResource.TIMESTAMP_FORMAT),
+        'shelvery:region': 'us-east-1',
+        'shelvery:src_account': '123456789012'
+    }
+    backup = BackupResource.construct('shelvery', 'snap-1', tags)
+    if entity_tags is not None:
+        backup.entity_resource = EntityResource('vol-1', 'us-east-1', date_created, entity_tags)
+    return backup
+
+
+class ShelveryRetentionEvaluatorTestCase(unittest.TestCase):
+    """Shelvery retention evaluation tests"""
+
+    def setUp(self):
+        self.now = datetime(2019, 3, 31, 12, 0)
+        self.engine = RetentionTestEngine({
+            'shelvery_keep_daily_backups': '7',
+            'shelvery_custom_retention_types': 'hourly:3600'
+        })
+
+    def random_backups(self, count, seed=0):
+        rnd = random.Random(seed)
+        retention_types = ['daily', 'weekly', 'monthly', 'yearly', 'hourly', 'unknown']
+        overrides = [None, {'shelvery:config:shelvery_keep_monthly_backups': '1'}]
+        backups = []
+        for _ in range(count):
+            # runs happen every day at same minute, over several years
+            date_created = self.now - timedelta(days=rnd.randint(0, 4 * 365), hours=rnd.choice([0, 1]))
+            backups.append(create_backup(date_created, rnd.choice(retention_types), rnd.choice(overrides)))
+        return backups
+
+    def test_MatchesPerBackupEvaluation(self):
+        backups = self.random_backups(5000)
+        custom_retention_types = RuntimeConfig.get_custom_retention_types(self.engine)
+        evaluator = RetentionEvaluator(self.engine, now=self.now)
+        results = list(evaluator.evaluate(backups))
+
+        self.assertEqual([r[0] for r in results], backups)
+        for backup, is_stale, error in results:
+            self.assertIsNone(error)
+            if backup.retention_type == 'unknown':
+                self.assertFalse(is_stale)
+                continue
+            expected_expire_date = backup.expire_date
+            backup.calculate_expire_date(self.engine, custom_retention_types)
+            self.assertEqual(backup.expire_date, expected_expire_date)
+            self.assertEqual(is_stale, self.now > backup.expire_date)
+
+    def test_MonthEndBoundary(self):
+        # 31st of month plus one month is clamped to end of next month
+        backups = [create_backup(datetime(2019, 1, 31, 12, 0), 'monthly'),
+                   create_backup(datetime(2019, 2, 28, 12, 0), 'monthly'),
+                   create_backup(datetime(2019, 2, 28, 12, 1), 'monthly')]
+        engine = RetentionTestEngine({'shelvery_keep_monthly_backups': '1'})
+        evaluator = RetentionEvaluator(engine, now=datetime(2019, 3, 28, 12, 0, 30))
+        self.assertEqual([is_stale for _, is_stale, _ in evaluator.evaluate(backups)], [True, True, False])
+
+    def test_InvalidOverrideReportsError(self):
+        backups = [create_backup(self.now, 'daily', {'shelvery:config:shelvery_keep_daily_backups': 'x'}),
+                   create_backup(self.now - timedelta(days=30), 'daily')]
+        results = list(RetentionEvaluator(self.engine, now=self.now).evaluate(backups))
+        self.assertIsNotNone(results[0][2])
+        self.assertIsNone(results[1][2])
+        self.assertTrue(results[1][1])
+
+    def test_StampedExpireDate(self):
+        backup = create_backup(self.now - timedelta(days=1), 'daily')
+        backup.stamp_expire_date(self.engine, RuntimeConfig.get_custom_retention_types(self.engine))
+        self.assertEqual(backup.expire_at_tag, (self.now + timedelta(days=6)).strftime(BackupResource.TIMESTAMP_FORMAT))
+
+        # stamped date is used only when trusted, retention is resolved otherwise
+        backup.tags['shelvery:expire_at'] = (self.now - timedelta(minutes=1)).strftime(BackupResource.TIMESTAMP_FORMAT)
+        results = list(RetentionEvaluator(self.engine, now=self.now).evaluate([backup]))
+        self.assertFalse(results[0][1])
+
+        trusting_engine = RetentionTestEngine({'shelvery_trust_expire_at_tag': 'true'})
+        results = list(RetentionEvaluator(trusting_engine, now=self.now).evaluate([backup]))
+        self.assertTrue(results[0][1])
+        self.assertEqual(backup.expire_date, self.now - timedelta(minutes=1))
+
+    @unittest.skipUnless(os.environ.get('SHELVERY_BENCHMARK') == '1', 'benchmarks run with SHELVERY_BENCHMARK=1')
+    def test_Benchmark100kBackups(self):
+        backups = self.random_backups(100000, seed=1)
+        evaluator = RetentionEvaluator(self.engine, now=self.now)
+        started = time.perf_counter()
+        stale = sum(1 for _, is_stale, _ in evaluator.evaluate(backups) if is_stale)
+        elapsed = time.perf_counter() - started
+        print(f"Evaluated {len(backups)} backups in {elapsed:.3f}s, {stale} expired")
+        self.assertLess(elapsed, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+import unittest
+import os
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.append(f"{pwd}/..")
+sys.path.append(f"{pwd}/../shelvery")
+sys.path.append(f"{pwd}/shelvery")
+sys.path.append(f"{pwd}/lib")
+sys.path.append(f"{pwd}/../lib")
+
+from shelvery.runtime_config import RuntimeConfig
+
+
+class ConfigTestEngine:
+
+    def __init__(self, config):
+        self.lambda_payload = {'config': config}
+        self.resolved_config = None
+
+
+class ShelveryRuntimeConfigTestCase(unittest.TestCase):
+    """Shelvery runtime configuration tests"""
+
+    def tearDown(self):
+        os.environ.pop('shelvery_keep_daily_backups', None)
+
+    def test_ResolvedConfigReused(self):
+        payload = {'backup_type': 'ebs', 'action': 'do_store_backup_data', 'config': {'shelvery_keep_daily_backups': 7}}
+        resolved = RuntimeConfig.resolve(payload)
+        self.assertEqual(resolved.get('shelvery_keep_daily_backups'), 7)
+
+        # later invocation with same configuration, e.g. in warm lambda container, reuses resolved values
+        invocation = dict(payload, arguments={'BackupId': 'snap-1'}, config={'shelvery_keep_daily_backups': 7})
+        self.assertIs(RuntimeConfig.resolve(invocation), resolved)
+
+    def test_ResolvedConfigInvalidated(self):
+        resolved = RuntimeConfig.resolve({'config': {'shelvery_keep_weekly_backups': 4}})
+
+        # payload configuration changed
+        changed = RuntimeConfig.resolve({'config': {'shelvery_keep_weekly_backups': 5}})
+        self.assertIsNot(changed, resolved)
+        self.assertEqual(changed.get('shelvery_keep_weekly_backups'), 5)
+
+        # environment changed
+        os.environ['shelvery_keep_daily_backups'] = '3'
+        changed = RuntimeConfig.resolve({'config': {'shelvery_keep_weekly_backups': 4}})
+        self.assertIsNot(changed, resolved)
+        self.assertEqual(changed.get('shelvery_keep_daily_backups'), '3')
+
+    def test_SelectEntities(self):
+        engine = ConfigTestEngine({'shelvery_select_entity': ' vol-1, ,vol-2,'})
+        self.assertEqual(RuntimeConfig.get_shelvery_select_entities(engine), ['vol-1', 'vol-2'])
+
+        # single entity, as accepted before lists were supported
+        engine = ConfigTestEngine({'shelvery_select_entity': 'vol-1'})
+        self.assertEqual(RuntimeConfig.get_shelvery_select_entities(engine), ['vol-1'])
+
+        # all entities are selected if none are given
+        for value in [None, '']:
+            engine = ConfigTestEngine({'shelvery_select_entity': value})
+            self.assertEqual(RuntimeConfig.get_shelvery_select_entities(engine), [])
+
+
+if __name__ == '__main__':
+    unittest.main()